@@ -0,0 +1,319 @@
+"""Benchmark suite for graphics.py
+
+Times scene construction at several object counts, reconfiguring,
+move-heavy animation frames, setCoords and redraw, Image pixel loops
+and the import of graphics. Benchmarks the Tk backend by default, and
+runs headless: with no DISPLAY it starts a private Xvfb server, and
+fails if Xvfb is not installed. Use --backend raster to benchmark the
+raster backend instead.
+
+Results are written as JSON. Every benchmark is compared against a
+baseline recorded by an earlier run on the same machine (see
+--save-baseline), and the script exits with status 1 if any is slower
+than the baseline by more than the threshold. Without a baseline it
+exits with status 2, unless --no-compare is given.
+
+    python benchmarks/bench_graphics.py [--backend tk|raster]
+        [--output FILE] [--baseline FILE] [--save-baseline | --no-compare]
+        [--threshold FRACTION] [--repeat N] [--quick]
+"""
+
+import argparse, json, os, platform, random, shutil, subprocess, sys, time
+
+from bench_import import ROOT, timeImport
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Differences below this many seconds are never counted as regressions
+NOISE_FLOOR = 0.0005
+
+graphics = None   # imported by main once the backend is chosen
+
+def startXvfb():
+    """Starts an Xvfb server on a free display and points DISPLAY at
+    it. Returns the server process, or None if Xvfb is not installed
+    or fails to start."""
+    if not shutil.which("Xvfb"):
+        return None
+    for number in range(99, 199):
+        if not os.path.exists("/tmp/.X{}-lock".format(number)):
+            break
+    else:
+        return None
+    display = ":{}".format(number)
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24",
+                               "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket = "/tmp/.X11-unix/X{}".format(number)
+    for i in range(100):
+        if os.path.exists(socket):
+            os.environ["DISPLAY"] = display
+            return server
+        if server.poll() is not None:
+            return None
+        time.sleep(0.05)
+    server.terminate()
+    return None
+
+def startDisplay(backend):
+    """Returns the Xvfb process started for the backend, or None if
+    it needs none. Exits if the Tk backend has no display."""
+    if backend != "tk" or os.environ.get("DISPLAY"):
+        return None
+    server = startXvfb()
+    if server is None:
+        sys.exit("No DISPLAY and Xvfb could not be started; "
+                 "use --backend raster to benchmark the raster backend")
+    return server
+
+# Scenes
+
+def makeScene(count, size=400, seed=1):
+    """Returns count undrawn objects of mixed kinds scattered over a
+    size by size area"""
+    rnd = random.Random(seed)
+    colors = ["red", "blue", "green", "orange", "purple", ""]
+    objs = []
+    for i in range(count):
+        x, y = rnd.uniform(0, size), rnd.uniform(0, size)
+        kind = i % 5
+        if kind == 0:
+            obj = graphics.Circle(graphics.Point(x, y), rnd.uniform(2, 12))
+        elif kind == 1:
+            obj = graphics.Rectangle(graphics.Point(x, y), graphics.Point(x+16, y+9))
+        elif kind == 2:
+            obj = graphics.Line(graphics.Point(x, y), graphics.Point(x+20, y+6))
+        elif kind == 3:
+            obj = graphics.Polygon(graphics.Point(x, y), graphics.Point(x+12, y),
+                                   graphics.Point(x+6, y+12))
+        else:
+            obj = graphics.Point(x, y)
+        obj.setFill(rnd.choice(colors))
+        objs.append(obj)
+    return objs
+
+def newWindow(size=400):
+    return graphics.GraphWin("Benchmark", size, size, autoflush=False)
+
+def show(win):
+    # Brings the window up to date, including rendering for the
+    #   raster backend, which otherwise only renders on demand
+    win.update()
+    if isinstance(win, graphics.RasterWin):
+        win.getPixels()
+
+# Benchmarks: each takes an object count and returns the seconds taken
+#   by the measured part
+
+def benchConstruct(count):
+    win = newWindow()
+    start = time.perf_counter()
+    for obj in makeScene(count):
+        obj.draw(win)
+    show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed
+
+def benchReconfig(count):
+    win = newWindow()
+    objs = makeScene(count)
+    for obj in objs:
+        obj.draw(win)
+    show(win)
+    start = time.perf_counter()
+    for obj in objs:
+        obj.setFill("yellow")
+        obj.setOutline("navy")
+        if not isinstance(obj, graphics.Point):
+            obj.setWidth(2)
+    show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed
+
+def benchMoveFrame(count, frames=20):
+    # Seconds per animation frame moving every object
+    win = newWindow()
+    objs = makeScene(count)
+    for obj in objs:
+        obj.draw(win)
+    show(win)
+    start = time.perf_counter()
+    for frame in range(frames):
+        step = 1 if frame % 2 else -1
+        for obj in objs:
+            obj.move(step, step)
+        show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed / frames
+
+def benchSetCoords(count, calls=10):
+    # Seconds per setCoords call panning over the scene
+    win = newWindow()
+    objs = makeScene(count)
+    for obj in objs:
+        obj.draw(win)
+    show(win)
+    start = time.perf_counter()
+    for i in range(calls):
+        win.setCoords(i*10, i*5, 400 + i*10, 400 + i*5)
+        show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed / calls
+
+def benchRedraw(count):
+    win = newWindow()
+    for obj in makeScene(count):
+        obj.draw(win)
+    show(win)
+    start = time.perf_counter()
+    win.redraw()
+    show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed
+
+def benchSetPixel(size):
+    win = newWindow()
+    image = graphics.Image(graphics.Point(200, 200), size, size)
+    image.draw(win)
+    start = time.perf_counter()
+    for y in range(size):
+        for x in range(size):
+            image.setPixel(x, y, "red" if (x ^ y) & 4 else "blue")
+    show(win)
+    elapsed = time.perf_counter() - start
+    win.close()
+    return elapsed
+
+def benchGetPixel(size):
+    image = graphics.Image(graphics.Point(0, 0), size, size)
+    start = time.perf_counter()
+    for y in range(size):
+        for x in range(size):
+            image.getPixel(x, y)
+    return time.perf_counter() - start
+
+def suite(quick):
+    """Returns (name, function, argument) for each benchmark"""
+    counts = (100, 1000) if quick else (100, 1000, 10000)
+    scene = 1000 if quick else 5000
+    pixels = 50 if quick else 100
+    benches = [("construct_{}".format(n), benchConstruct, n) for n in counts]
+    benches += [
+        ("reconfig_{}".format(scene), benchReconfig, scene),
+        ("move_frame_1000", benchMoveFrame, 1000),
+        ("setcoords_{}".format(scene), benchSetCoords, scene),
+        ("redraw_{}".format(scene), benchRedraw, scene),
+        ("image_setpixel_{}".format(pixels), benchSetPixel, pixels),
+        ("image_getpixel_{}".format(pixels), benchGetPixel, pixels),
+    ]
+    return benches
+
+def runSuite(backend, repeat, quick):
+    """Runs the benchmarks, returning the results dictionary. Each
+    benchmark reports the best of repeat runs, after a first run to
+    warm up caches that is not counted."""
+    results = {}
+    for name, bench, arg in suite(quick):
+        bench(arg)
+        times = sorted(bench(arg) for i in range(repeat))
+        results[name] = {"best": times[0], "median": times[len(times)//2]}
+        print("{:<24} best {:>10.3f} ms  median {:>10.3f} ms".format(
+            name, times[0]*1000, times[len(times)//2]*1000))
+    times = timeImport(max(repeat, 5))
+    results["import"] = {"best": times[0], "median": times[len(times)//2]}
+    print("{:<24} best {:>10.3f} ms  median {:>10.3f} ms".format(
+        "import", times[0]*1000, times[len(times)//2]*1000))
+    return {
+        "backend": backend,
+        "quick": quick,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+def compare(current, baseline, threshold):
+    """Prints a comparison of the current results with the baseline
+    and returns the names of the benchmarks that regressed"""
+    regressions = []
+    print("\nCompared with baseline of {}:".format(baseline.get("time", "?")))
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            print("  {:<24} (not in baseline)".format(name))
+            continue
+        now, before = result["best"], base["best"]
+        ratio = now / before if before else float("inf")
+        slower = now > before * (1 + threshold) and now - before > NOISE_FLOOR
+        print("  {:<24} {:>10.3f} ms vs {:>10.3f} ms  {:>+7.1%}{}".format(
+            name, now*1000, before*1000, ratio - 1, "  REGRESSION" if slower else ""))
+        if slower:
+            regressions.append(name)
+    return regressions
+
+def main():
+    global graphics
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("tk", "raster"), default="tk")
+    parser.add_argument("--output", help="file to write the JSON results to")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="JSON results to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to the baseline file")
+    parser.add_argument("--no-compare", action="store_true",
+                        help="only measure, without comparing to a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown over the baseline counted as a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller object counts, for a fast check")
+    args = parser.parse_args()
+    compareRun = not (args.save_baseline or args.no_compare)
+    if compareRun and not os.path.exists(args.baseline):
+        print("FAIL: no baseline at {}; record one with --save-baseline, "
+              "or pass --no-compare".format(args.baseline))
+        return 2
+
+    backend = args.backend
+    server = startDisplay(backend)
+    os.environ["GRAPHICS_BACKEND"] = backend
+    sys.path.insert(0, ROOT)
+    try:
+        import graphics
+        print("Benchmarking graphics {} with the {} backend{}".format(
+            graphics.__version__, backend,
+            " (Xvfb {})".format(os.environ["DISPLAY"]) if server else ""))
+        current = runSuite(backend, args.repeat, args.quick)
+    finally:
+        if server is not None:
+            server.terminate()
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(current, out, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump(current, out, indent=2, sort_keys=True)
+        print("\nSaved baseline to", args.baseline)
+    if not compareRun:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get("backend"), baseline.get("quick")) != (backend, args.quick):
+        print("\nFAIL: baseline was recorded with the {} backend{}, not comparable".format(
+            baseline.get("backend"), " and --quick" if baseline.get("quick") else ""))
+        return 2
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print("\nFAIL: {} benchmark(s) slower than the baseline by over {:.0%}: {}".format(
+            len(regressions), args.threshold, ", ".join(regressions)))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Import-time benchmark for graphics.py
+
+Times "import graphics" in fresh interpreters with DISPLAY unset, so
+the import must not need Tk or a display. Exits with status 1 if the
+import fails or the median time is over the limit.
+
+    python benchmarks/bench_import.py [--runs N] [--limit SECONDS]
+"""
+
+import argparse, os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import graphics
+print(time.perf_counter() - start)
+"""
+
+def timeImport(runs=10):
+    """Returns the sorted import times, in seconds, of runs fresh imports"""
+    env = dict(os.environ)
+    env.pop("DISPLAY", None)
+    env["PYTHONPATH"] = ROOT
+    times = []
+    for i in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", SCRIPT],
+                                      env=env, cwd=ROOT)
+        times.append(float(out))
+    return sorted(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--limit", type=float, default=0.2,
+                        help="maximum median import time in seconds")
+    args = parser.parse_args()
+    try:
+        times = timeImport(args.runs)
+    except subprocess.CalledProcessError:
+        print("import graphics failed without a display")
+        return 1
+    median = times[len(times)//2]
+    print("import graphics: median {:.1f} ms, best {:.1f} ms ({} runs)".format(
+        median*1000, times[0]*1000, len(times)))
+    if median > args.limit:
+        print("FAIL: median import time is over {:.0f} ms".format(args.limit*1000))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
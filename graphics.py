@@ -161,11 +161,15 @@ __version__ = "5.0"
 #     Added Entry boxes.
 
 import time, os, sys
+import bisect, struct, threading, weakref, zlib
+from array import array
+import queue
+from collections import deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from types import MappingProxyType
 
-try:  # import as appropriate for 2.x vs. 3.x
-   import tkinter as tk
-except:
-   import Tkinter as tk
+import tkinter as tk
 
 
 ##########################################################################
@@ -182,11 +186,79 @@ BAD_OPTION = "Illegal option value"
 ##########################################################################
 # global variables and funtions
 
-_root = tk.Tk()
-_root.withdraw()
+# The hidden Tk root window is only created when it is first needed
+#   (see _getRoot), so importing this module does not start Tk and
+#   works without a display.
+_root = None
+
+def _getRoot():
+    global _root
+    if _root is None:
+        _root = tk.Tk()
+        _root.withdraw()
+        # MacOS fix 1
+        _root.update()
+    return _root
+
+# NumPy is optional; it is used for bulk coordinate and pixel operations
+#   and imported on first use
+_np = False
+
+def _numpy():
+    global _np
+    if _np is False:
+        try:
+            import numpy
+            _np = numpy
+        except ImportError:
+            _np = None
+    return _np
+
+def _isArray(obj):
+    # True for NumPy arrays (and subclasses). There are none unless NumPy
+    #   has been imported, so this never imports it; it does set _np.
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(obj, np.ndarray) and _numpy() is not None
 
 _update_lasttime = time.time()
 
+# Windows with commands submitted by other threads, applied by update
+_submitted = set()
+_submittedLock = threading.Lock()
+
+# Commands submitted from other threads wake the Tk event loop by
+#   writing to a pipe it watches. Where Tk cannot watch files (Windows),
+#   a window waiting for input checks for them every _COMMAND_POLL
+#   milliseconds instead. The timer also runs while a window has
+#   commands left over from processCommands.
+_COMMAND_POLL = 10
+_wakeup = None  # (read fd, write fd) of the pipe once set up, False without one
+
+def _watchCommands():
+    # Sets up the wakeup pipe; called on the Tk thread
+    global _wakeup
+    if _wakeup is None:
+        if not hasattr(_root.tk, "createfilehandler"):
+            _wakeup = False
+            return
+        _wakeup = os.pipe()
+        for fd in _wakeup:
+            os.set_blocking(fd, False)
+        _root.tk.createfilehandler(_wakeup[0], tk.READABLE, _onWakeup)
+
+def _onWakeup(fd, mask):
+    # Apply the commands submitted since the pipe was written
+    try:
+        while os.read(fd, 512):
+            pass
+    except BlockingIOError:
+        pass
+    with _submittedLock:
+        windows = list(_submitted)
+    for win in windows:
+        if win._commandAfter is None:
+            win._pollCommands()
+
 def update(rate=None):
     global _update_lasttime
     if rate:
@@ -198,39 +270,253 @@ def update(rate=None):
         else:
             _update_lasttime = now
 
-    _root.update()
+    if _submitted:
+        with _submittedLock:
+            windows = list(_submitted)
+        for win in windows:
+            win.processCommands()
+    if _root is not None:
+        _root.update()
+
+_clock = time.perf_counter
+
+class Animator:
+
+    """Runs an animation loop with a fixed simulation timestep.
+
+    Functions registered with onTick(func) are called as func(dt)
+    every simulation step of dt seconds, independent of the frame
+    rate. Functions registered with onFrame(func) are called once per
+    rendered frame as func(alpha), where alpha in [0,1) is how far the
+    simulation clock has run past the last tick (for interpolation).
+    When a frame runs late, extra ticks are run to catch up, at most
+    maxTicks per frame; any backlog beyond that is dropped so one slow
+    frame does not snowball."""
+
+    def __init__(self, rate=60, dt=None, maxTicks=5, history=600):
+        self.rate = rate
+        self.dt = dt or 1.0/rate
+        self.maxTicks = maxTicks
+        self.running = False
+        self._tickFuncs = []
+        self._frameFuncs = []
+        self._history = history
+        self.resetStats()
+
+    def onTick(self, func):
+        """Register func(dt) to run every simulation step"""
+        self._tickFuncs.append(func)
+        return func
+
+    def onFrame(self, func):
+        """Register func(alpha) to run every rendered frame"""
+        self._frameFuncs.append(func)
+        return func
+
+    def resetStats(self):
+        self.frames = 0
+        self.ticks = 0
+        self.droppedFrames = 0
+        self.droppedTicks = 0
+        self._frameTimes = deque(maxlen=self._history)
+        self._lastFrame = None
+        self._lag = 0.0
+
+    def step(self):
+        """Run one frame: due simulation ticks, frame callbacks and
+        an update of the windows."""
+        now = _clock()
+        if self._lastFrame is not None:
+            elapsed = now - self._lastFrame
+            self._frameTimes.append(elapsed)
+            self._lag = self._lag + elapsed
+        self._lastFrame = now
+
+        dt = self.dt
+        ticks = 0
+        while self._lag >= dt and ticks < self.maxTicks:
+            for func in self._tickFuncs:
+                func(dt)
+            self._lag = self._lag - dt
+            ticks = ticks + 1
+        if self._lag >= dt:
+            behind = int(self._lag / dt)
+            self._lag = self._lag - behind*dt
+            self.droppedTicks = self.droppedTicks + behind
+        self.ticks = self.ticks + ticks
+
+        alpha = self._lag / dt
+        for func in self._frameFuncs:
+            func(alpha)
+        update()
+        self.frames = self.frames + 1
+
+    def run(self, frames=None, duration=None):
+        """Run frames at the target rate until stop() is called, or
+        until the given number of frames or seconds have passed.
+        Frame deadlines are kept on a fixed schedule, so sleeps
+        compensate for drift; deadlines that have already passed are
+        skipped and counted as dropped frames."""
+        period = 1.0/self.rate
+        start = deadline = _clock()
+        count = 0
+        self.running = True
+        try:
+            while self.running:
+                if frames is not None and count >= frames: break
+                if duration is not None and _clock() - start >= duration: break
+                self.step()
+                count = count + 1
+                deadline = deadline + period
+                now = _clock()
+                if now < deadline:
+                    time.sleep(deadline - now)
+                else:
+                    missed = int((now - deadline) / period)
+                    self.droppedFrames = self.droppedFrames + missed
+                    deadline = deadline + missed*period
+        finally:
+            self.running = False
+
+    def stop(self):
+        """Make run() return after the current frame"""
+        self.running = False
+
+    def getStats(self):
+        """Return a dictionary of frame statistics: frame and tick
+        counts, mean, 95th percentile and max frame time in seconds
+        over recent frames, and dropped frames and ticks."""
+        times = sorted(self._frameTimes)
+        n = len(times)
+        return {"frames": self.frames,
+                "ticks": self.ticks,
+                "mean": sum(times)/n if n else 0.0,
+                "p95": times[int(0.95*(n-1))] if n else 0.0,
+                "max": times[-1] if n else 0.0,
+                "dropped": self.droppedFrames,
+                "droppedTicks": self.droppedTicks}
 
 ############################################################################
 # Graphics classes start here
         
+# GraphWin methods counted and timed by instrumentation. _refresh is the
+#   update made after each operation when autoflush is on.
+_INSTRUMENTED = ("create_line", "create_rectangle", "create_oval",
+                 "create_polygon", "create_text", "create_image",
+                 "create_window", "itemconfig", "itemconfigure", "coords",
+                 "move", "delete", "tag_raise", "tag_lower",
+                 "addtag_withtag", "dtag", "update", "update_idletasks",
+                 "_refresh", "_runScript")
+
+# GraphWin methods that act for the graphics object passed to them; while
+#   instrumented, the canvas operations they make are counted for its
+#   class. Operations queued and sent by _flushPending are counted for
+#   the class of the item they name.
+_ATTRIBUTED = ("_createItem", "_releaseItem", "_stackObject", "_flushPending")
+
+# Backslash escapes for the characters that are special in a Tcl word
+_TCL_ESCAPES = dict((ord(c), "\\" + c) for c in '\\{}[]$";# ')
+_TCL_ESCAPES.update({ord("\n"): "\\n", ord("\r"): "\\r", ord("\t"): "\\t",
+                     ord("\v"): "\\v", ord("\f"): "\\f"})
+
+def _tclWord(value):
+    # value as one word of a Tcl script; tuples and lists become Tcl lists
+    if isinstance(value, (tuple, list)):
+        value = " ".join(_tclWord(v) for v in value)
+    else:
+        value = str(value)
+    return value.translate(_TCL_ESCAPES) if value else "{}"
+
+def _backend(name=None):
+    # Returns the backend to use: name if given, else the one selected
+    #   by the GRAPHICS_BACKEND environment variable, else "tk"
+    name = name or os.environ.get("GRAPHICS_BACKEND") or "tk"
+    if name not in ("tk", "raster"):
+        raise GraphicsError("Unknown graphics backend: " + name)
+    return name
+
 class GraphWin(tk.Canvas):
 
-    """A GraphWin is a toplevel window for displaying graphics."""
+    """A GraphWin is a toplevel window for displaying graphics.
+
+    With backend="raster" (or GRAPHICS_BACKEND=raster in the
+    environment) the window is a RasterWin, which draws into an
+    offscreen pixel buffer instead of a Tk window."""
+
+    # Shapes drawn in a batch are created by one Tcl script at commit
+    _scriptCreates = True
+
+    def __new__(cls, *args, **kw):
+        if cls is GraphWin:
+            backend = kw.get("backend", args[4] if len(args) > 4 else None)
+            if _backend(backend) == "raster":
+                cls = RasterWin
+        return tk.Canvas.__new__(cls)
 
     def __init__(self, title="Graphics Window",
-                 width=200, height=200, autoflush=True):
+                 width=200, height=200, autoflush=True, backend=None):
         assert type(title) == type(""), "Title must be a string"
-        master = tk.Toplevel(_root)
+        master = tk.Toplevel(_getRoot())
         master.protocol("WM_DELETE_WINDOW", self.close)
         tk.Canvas.__init__(self, master, width=width, height=height, highlightthickness=0, bd=0)
         self.master.title(title)
         self.pack()
         master.resizable(0,0)
+        self._initState(width, height, autoflush)
+        _watchCommands()
+        self.bind("<Button-1>", self._onClick)
+        self.bind_all("<Key>", self._onKey)
+        master.lift()
+        self._inputEvent = tk.IntVar(_root) # written on every click/key/close
+        self._timedOut = False
+        if autoflush: _root.update()
+
+    def _initState(self, width, height, autoflush):
+        # Sets up the window state that does not depend on the backend
         self.foreground = "black"
-        self.items = []
+        self._items = {}      # drawn GraphicsObject -> stacking key, in draw order
+        self._itemsById = {}  # Tk id -> drawn GraphicsObject
+        self._groupTags = {}  # drawn object -> tags of the groups it is drawn in
+        self._stackCount = 0
+        self._index = None    # _GridIndex for pick and query, built on demand
+        self._culling = False
+        self._view = None     # world box of the viewport, while culling
+        self._shownKeys = None  # stacking keys of the culled window's items, sorted
+        self._shownObjs = None  # and their objects
+        self._pools = None    # (item type, option names) -> hidden item ids, while pooling
+        self._poolSize = 0
+        self._stats = None    # (operation, class) -> [calls, time, max], when instrumented
+        self._statsStart = None
+        self._reportEvery = None
+        self._reportFile = None
+        self._lastReport = None
         self.mouseX = None
         self.mouseY = None
-        self.bind("<Button-1>", self._onClick)
-        self.bind_all("<Key>", self._onKey)
         self.height = int(height)
         self.width = int(width)
         self.autoflush = autoflush
         self._mouseCallback = None
         self.trans = None
         self.closed = False
-        master.lift()
         self.lastKey = ""
-        if autoflush: _root.update()
+        self._batchDepth = 0
+        self._pendingDeletes = []
+        self._pendingConfig = {}  # Tk id -> options changed since last flush
+        self._pendingMoves = {}   # Tk id -> [dx, dy] moved since last flush
+        self._pendingCreates = {} # object drawn in a batch -> its group tags
+        self._flushAfter = None   # id of the idle callback that flushes, if scheduled
+        self._pixels = None       # rgb rows of the pixel layer, if on
+        self._plotted = None      # 1 for each pixel of the layer that was plotted
+        self._pixelImage = None
+        self._pixelItem = None
+        self._dirtyRows = set()   # pixel layer rows changed since last flush
+        self._commands = {}       # (object, operation) -> [operation, args], from submit
+        self._commandLock = threading.Condition()
+        self._commandLimit = 10000
+        self._commandRate = 1000
+        self._tkThread = threading.current_thread()
+        self._commandAfter = None # id of the timer that applies commands, if running
+        self._waiting = False     # waiting for input in _waitFor
 
     def __repr__(self):
         if self.isClosed():
@@ -249,27 +535,44 @@ class GraphWin(tk.Canvas):
 
     def _onKey(self, evnt):
         self.lastKey = evnt.keysym
+        self._inputEvent.set(1)
 
 
     def setBackground(self, color):
         """Set background color of the window"""
         self.__checkOpen()
         self.config(bg=color)
-        self.__autoflush()
+        if self._pixels is not None:
+            self._refillPixels()
+        self._autoflush()
         
     def setCoords(self, x1, y1, x2, y2):
         """Set coordinates of window to run from (x1,y1) in the
         lower-left corner to (x2,y2) in the upper-right corner."""
         self.trans = Transform(self.width, self.height, x1, y1, x2, y2)
-        self.redraw()
+        if self._index is not None and not self._index.rescaled():
+            self._index = None
+        self._reproject()
 
     def close(self):
         """Close the window"""
 
         if self.closed: return
         self.closed = True
+        self._pendingConfig = {}
+        self._pendingMoves = {}
+        self._pendingCreates = {}
+        self._dropCommands()
+        # The Tcl commands of the window's callbacks go with it
+        if self._flushAfter is not None:
+            self.after_cancel(self._flushAfter)
+            self._flushAfter = None
+        if self._commandAfter is not None:
+            self.after_cancel(self._commandAfter)
+            self._commandAfter = None
         self.master.destroy()
-        self.__autoflush()
+        self._inputEvent.set(1) # wake up a pending getMouse/getKey
+        self._autoflush()
 
 
     def isClosed(self):
@@ -280,40 +583,481 @@ class GraphWin(tk.Canvas):
         return not self.closed
 
 
-    def __autoflush(self):
+    def _refresh(self):
+        # Bring the display up to date
+        _root.update()
+
+    def _autoflush(self):
+        # Flush after a single operation, unless a batch is collecting
+        #   operations to be flushed together when it is committed.
+        if self.autoflush and not self._batchDepth:
+            self._refresh()
+
+    def beginBatch(self):
+        """Start collecting drawing operations. Updates to the window
+        are held back until the matching commitBatch. Batches may be
+        nested; only the outermost commit flushes. Shapes and Text
+        drawn in a batch are created together, by a single Tcl script,
+        when it is flushed; until then they have no canvas item id."""
+        self.__checkOpen()
+        self._batchDepth = self._batchDepth + 1
+
+    def commitBatch(self):
+        """Send all drawing operations collected since beginBatch to
+        the window and flush it once."""
+        if not self._batchDepth:
+            raise GraphicsError("commitBatch without beginBatch")
+        self._batchDepth = self._batchDepth - 1
+        if self._batchDepth or self.closed:
+            return
+        self._flushPending()
         if self.autoflush:
-            _root.update()
+            self._refresh()
+
+    @contextmanager
+    def batch(self):
+        """Context manager wrapping beginBatch/commitBatch, e.g.
+
+        with win.batch():
+            for i in range(1000):
+                Circle(Point(i, i), 5).draw(win)
+        """
+        self.beginBatch()
+        try:
+            yield self
+        finally:
+            self.commitBatch()
+
+    def _deleteItem(self, id):
+        # Inside a batch, deletes are queued and sent in a single call
+        self._dropPending(id)
+        if self._batchDepth:
+            self._pendingDeletes.append(id)
+        else:
+            self.delete(id)
+
+    def _dropPending(self, id):
+        # Forget queued changes to an item that is being deleted
+        self._pendingConfig.pop(id, None)
+        self._pendingMoves.pop(id, None)
+
+    def _configItem(self, id, options):
+        # Change options of item id. While updates are held back (in a
+        #   batch or with autoflush off), changes are merged per item and
+        #   sent as one itemconfig when the window flushes.
+        if self._batchDepth or not self.autoflush:
+            pending = self._pendingConfig.get(id)
+            if pending is None:
+                self._pendingConfig[id] = dict(options)
+                self._scheduleFlush()
+            else:
+                pending.update(options)
+        else:
+            self.itemconfig(id, options)
+            self._refresh()
+
+    def _moveItem(self, id, dx, dy):
+        # Move item id by a screen offset. While updates are held back,
+        #   offsets are summed per item, so an object moved many times
+        #   per frame gets a single canvas move when the window flushes.
+        if self._batchDepth or not self.autoflush:
+            pending = self._pendingMoves.get(id)
+            if pending is None:
+                self._pendingMoves[id] = [dx, dy]
+                self._scheduleFlush()
+            else:
+                pending[0] += dx
+                pending[1] += dy
+        else:
+            self.move(id, dx, dy)
+            self._refresh()
+
+    def _scheduleFlush(self):
+        # Make sure queued changes are sent the next time Tk is idle,
+        #   even if the program never calls flush or update itself.
+        if self._flushAfter is None:
+            self._flushAfter = self.after_idle(self._idleFlush)
+
+    def _idleFlush(self):
+        self._flushAfter = None
+        if not self.closed:
+            self._flushPending()
+
+    def _flushMoves(self):
+        pending = self._pendingMoves
+        self._pendingMoves = {}
+        for id, (dx, dy) in pending.items():
+            if dx or dy:
+                self.move(id, dx, dy)
+
+    def _flushPending(self):
+        # Send operations queued by a batch to Tk
+        if self._pendingConfig:
+            pending = self._pendingConfig
+            self._pendingConfig = {}
+            for id, options in pending.items():
+                self.itemconfig(id, options)
+        if self._pendingMoves:
+            self._flushMoves()
+        if self._dirtyRows:
+            self._flushPixels()
+        if self._pendingDeletes:
+            self.delete(*self._pendingDeletes)
+            self._pendingDeletes = []
+        if self._pendingCreates:
+            self._flushCreates()
+
+    def _flushCreates(self):
+        # Create the items of the shapes drawn in a batch with one Tcl
+        #   script, made from their current coordinates and options, and
+        #   give the objects the ids it returns. Queued moves and
+        #   configs have been sent, so they don't apply twice.
+        pending = list(self._pendingCreates.items())
+        self._pendingCreates = {}
+        lines = ["set _graphicsIds {}"]
+        for obj, groupTags in pending:
+            lines.append("lappend _graphicsIds [" + self._createCommand(obj, groupTags) + "]")
+        # The ids are the script's result, and the variable goes with it
+        lines.append("lindex [list $_graphicsIds [unset _graphicsIds]] 0")
+        try:
+            ids = self.tk.splitlist(self._runScript("\n".join(lines)))
+        except tk.TclError:
+            # The items made before the error are kept. The object whose
+            #   command failed is drawn on its own, so an error in its
+            #   options is raised for it, and the rest stay queued.
+            ids = self.tk.splitlist(self.tk.globalgetvar("_graphicsIds"))
+            self.tk.globalunsetvar("_graphicsIds")
+            self._setCreatedIds(pending, ids)
+            if len(ids) < len(pending):
+                obj, groupTags = pending[len(ids)]
+                self._pendingCreates = dict(pending[len(ids)+1:])
+                obj.id = obj._draw(self, obj._itemOptions(groupTags))
+                self._itemsById[obj.id] = obj
+            # The object's own command works, so the script is at fault
+            raise
+        self._setCreatedIds(pending, ids)
+
+    def _setCreatedIds(self, pending, ids):
+        for (obj, groupTags), id in zip(pending, ids):
+            obj.id = self.tk.getint(id)
+            self._itemsById[obj.id] = obj
+
+    def _createCommand(self, obj, groupTags):
+        # The Tcl command that creates the canvas item of obj, as drawn
+        #   by its _draw: an item of its _itemType at its _coords
+        words = [self._w, "create", obj._itemType] + list(obj._coords(self))
+        for option, value in obj._itemOptions(groupTags).items():
+            if value is not None:
+                words.append("-" + option)
+                words.append(value)
+        return " ".join(_tclWord(word) for word in words)
+
+    def _settleCreates(self):
+        # Items are stacked in the order they are created, so shapes
+        #   still queued by a batch are created before an item made
+        #   directly (with everything queued before them)
+        if self._pendingCreates:
+            self._flushPending()
+
+    def _runScript(self, script):
+        return self.tk.call("eval", script)
 
     
     def plot(self, x, y, color="black"):
         """Set pixel (x,y) to the given color"""
         self.__checkOpen()
         xs,ys = self.toScreen(x,y)
-        self.create_line(xs,ys,xs+1,ys, fill=color)
-        self.__autoflush()
+        if self._pixels is not None:
+            self._setPixel(xs, ys, color)
+        else:
+            self._settleCreates()
+            self.create_line(xs,ys,xs+1,ys, fill=color)
+        self._autoflush()
         
     def plotPixel(self, x, y, color="black"):
         """Set pixel raw (independent of window coordinates) pixel
         (x,y) to color"""
         self.__checkOpen()
-        self.create_line(x,y,x+1,y, fill=color)
-        self.__autoflush()
+        if self._pixels is not None:
+            self._setPixel(x, y, color)
+        else:
+            self._settleCreates()
+            self.create_line(x,y,x+1,y, fill=color)
+        self._autoflush()
+
+    def setPixelLayer(self, enabled=True):
+        """Turn the pixel layer on or off. While it is on, plot and
+        plotPixel write into an image covering the window, below all
+        other objects, instead of creating a canvas item per pixel.
+        Changed rows are sent to the window when it flushes. Turning
+        the layer off removes it and its pixels."""
+        self.__checkOpen()
+        if enabled and self._pixels is None:
+            width, height = self.width, self.height
+            self._pixels = bytearray(bytes(bytearray(self._backgroundRGB())) * (width*height))
+            self._plotted = bytearray(width*height)
+            self._pixelImage = self._newPhoto(self._pixels, width, height)
+            self._pixelItem = self.create_image(0, 0, image=self._pixelImage, anchor="nw")
+            self.tag_lower(self._pixelItem)
+        elif not enabled and self._pixels is not None:
+            self.delete(self._pixelItem)
+            self._pixels = self._pixelImage = self._pixelItem = None
+            self._plotted = None
+            self._dirtyRows = set()
+        self._autoflush()
+
+    def _setPixel(self, x, y, color):
+        # Write one pixel of the pixel layer. Pixels outside the window
+        #   and the empty color are ignored, as they are by Tk.
+        x = int(round(x))
+        y = int(round(y))
+        if 0 <= x < self.width and 0 <= y < self.height:
+            rgb = _pixelColors.get(color)
+            if rgb is None:
+                rgb = self._colorRGB(color)
+                if rgb is None: return
+                rgb = _pixelColors[color] = bytes(bytearray(rgb))
+            n = y*self.width + x
+            self._pixels[3*n:3*n+3] = rgb
+            self._plotted[n] = 1
+            if not self._dirtyRows:
+                self._scheduleFlush()
+            self._dirtyRows.add(y)
+
+    def _refillPixels(self):
+        # Give the pixels of the layer that were never plotted the
+        #   current background color
+        rgb = bytes(bytearray(self._backgroundRGB()))
+        width = self.width
+        pixels, plotted = self._pixels, self._plotted
+        for y in range(self.height):
+            row = y*width
+            if not any(plotted[row:row+width]):
+                pixels[3*row:3*(row+width)] = rgb*width
+            else:
+                for n in range(row, row+width):
+                    if not plotted[n]:
+                        pixels[3*n:3*n+3] = rgb
+        if not self._dirtyRows:
+            self._scheduleFlush()
+        self._dirtyRows.update(range(self.height))
+
+    def _colorRGB(self, color):
+        # Returns color as an (r,g,b) tuple, asking Tk about color names
+        #   not known to _rgb
+        try:
+            return _rgb(color)
+        except GraphicsError:
+            try:
+                rgb = tuple(c >> 8 for c in self.winfo_rgb(color))
+            except tk.TclError:
+                raise GraphicsError("Unknown color: " + color)
+            _colorCache[color] = rgb
+            return rgb
+
+    def _backgroundRGB(self):
+        return self._colorRGB(self.cget("bg"))
+
+    def _newPhoto(self, data, width, height):
+        # A blank photo for the pixel layer; pixels are put as they change
+        return tk.PhotoImage(master=_getRoot(), width=width, height=height)
+
+    def _photo(self, img):
+        # The photo to draw for an Image's img
+        if isinstance(img, _RasterPhoto):
+            return img.tkPhoto()
+        return img
+
+    def _putRows(self, data, y, height):
+        _tkPhotoWrite(self._pixelImage, data, 0, y, self.width, height)
+
+    def _flushPixels(self):
+        # Send the changed rows of the pixel layer, one put per block of
+        #   consecutive rows
+        rows = sorted(self._dirtyRows)
+        self._dirtyRows = set()
+        step = 3*self.width
+        data = memoryview(self._pixels)
+        start = end = rows[0]
+        for row in rows[1:] + [None]:
+            if row == end + 1:
+                end = row
+                continue
+            self._putRows(data[start*step:(end+1)*step], start, end + 1 - start)
+            if row is not None:
+                start = end = row
       
+    def update(self):
+        # Submitted commands are applied first
+        if self._commands:
+            self.processCommands()
+            self._armCommands()
+        tk.Canvas.update(self)
+
     def flush(self):
         """Update drawing to the window"""
         self.__checkOpen()
+        self.processCommands()
+        self._flushPending()
         self.update_idletasks()
+
+    def submit(self, obj, operation, *args):
+        """Ask for obj.operation(*args) to be done on the Tk thread,
+        e.g. win.submit(ball, "move", dx, dy). Operation is "draw"
+        (in this window), "undraw", "move" or another method of obj,
+        such as "setFill". submit may be called from any thread. The
+        commands are applied on the Tk thread: by its event loop, so
+        also while it is in getMouse(), getKey() or mainloop(), and by
+        win.update(), the update() function, flush() and
+        processCommands(). (On Windows the event loop applies them only
+        in getMouse() and getKey(); a raster window has no event loop
+        and applies them in its update() and flush().) A command that
+        makes an earlier one for the same object redundant replaces it: moves add up, "draw" and
+        "undraw" replace each other, and a later call of any other
+        method replaces the earlier one. While the limit set by
+        setCommandLimits is reached, submit waits for the Tk thread to
+        catch up (or catches up itself when called on the Tk thread)."""
+        if operation in ("draw", "undraw"):
+            key = (obj, "draw")
+        elif callable(getattr(obj, operation, None)):
+            key = (obj, operation)
+        else:
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        lock = self._commandLock
+        with lock:
+            commands = self._commands
+            while len(commands) >= self._commandLimit and key not in commands \
+                    and not self.closed:
+                if threading.current_thread() is self._tkThread:
+                    self.processCommands()
+                else:
+                    lock.wait()
+            if self.closed:
+                raise GraphicsError("window is closed")
+            wake = not commands
+            if wake:
+                with _submittedLock:
+                    _submitted.add(self)
+            if operation == "move" and key in commands:
+                offset = commands[key][1]
+                offset[0] += args[0]
+                offset[1] += args[1]
+            elif operation == "move":
+                commands[key] = [operation, list(args)]
+            else:
+                # Replaced commands go to the back, after those they follow
+                commands.pop(key, None)
+                commands[key] = [operation, args]
+        if wake and threading.current_thread() is not self._tkThread:
+            self._wakeTk()
+
+    def processCommands(self, count=None):
+        """Apply commands submitted to the window, at most count of
+        them (by default the rate set by setCommandLimits), in one
+        batch. Must be called on the Tk thread. Returns the number of
+        commands applied."""
+        lock = self._commandLock
+        with lock:
+            commands = self._commands
+            if count is None:
+                count = self._commandRate
+            taken = []
+            for key in commands:
+                if len(taken) == count: break
+                taken.append(key)
+            taken = [(key[0], commands.pop(key)) for key in taken]
+            if not commands:
+                with _submittedLock:
+                    _submitted.discard(self)
+            lock.notify_all()
+        if taken and not self.closed:
+            with self.batch():
+                for obj, (operation, args) in taken:
+                    if operation == "draw":
+                        if obj.canvas is None:
+                            obj.draw(self)
+                    elif operation == "undraw":
+                        if obj.canvas is self:
+                            obj.undraw()
+                    else:
+                        getattr(obj, operation)(*args)
+        return len(taken)
+
+    def setCommandLimits(self, limit=10000, rate=1000):
+        """Set how many submitted commands may wait before submit
+        blocks, and how many processCommands applies per update"""
+        with self._commandLock:
+            self._commandLimit = limit
+            self._commandRate = rate
+            self._commandLock.notify_all()
+
+    def _pollCommands(self):
+        # Apply submitted commands from the Tk event loop
+        self._commandAfter = None
+        if self.closed: return
+        if self._commands:
+            self.processCommands()
+        self._armCommands()
+
+    def _armCommands(self):
+        # Start the timer for _pollCommands if commands are left over,
+        #   or the window waits for input with no wakeup pipe
+        if self._commandAfter is None and not self.closed and \
+                (self._commands or (self._waiting and not _wakeup)):
+            self._commandAfter = self.after(_COMMAND_POLL, self._pollCommands)
+
+    def _wakeTk(self):
+        # Wake the event loop to apply commands submitted from another
+        #   thread; a full pipe means it is woken already
+        if _wakeup:
+            try:
+                os.write(_wakeup[1], b"\0")
+            except BlockingIOError:
+                pass
+
+    def _dropCommands(self):
+        # Forget submitted commands of a closed window and wake the
+        #   threads waiting to submit more
+        with self._commandLock:
+            self._commands.clear()
+            with _submittedLock:
+                _submitted.discard(self)
+            self._commandLock.notify_all()
         
-    def getMouse(self):
+    def _waitFor(self, ready, timeout=None):
+        # Process Tk events until ready() is true, the window is closed
+        #   or timeout seconds have passed. Sleeps in Tk between events
+        #   rather than polling.
+        self._timedOut = False
+        timer = None
+        if timeout is not None:
+            timer = _root.after(max(0, int(timeout*1000)), self._onTimeout)
+        self._waiting = True
+        self._armCommands()
+        try:
+            while not ready() and not self.closed and not self._timedOut:
+                self.wait_variable(self._inputEvent)
+        finally:
+            self._waiting = False
+            if timer is not None and not self._timedOut:
+                _root.after_cancel(timer)
+        return ready()
+
+    def _onTimeout(self):
+        self._timedOut = True
+        self._inputEvent.set(1)
+
+    def getMouse(self, timeout=None):
         """Wait for mouse click and return Point object representing
-        the click"""
+        the click. If timeout (in seconds) is given and runs out
+        before a click, returns None."""
         self.update()      # flush any prior clicks
         self.mouseX = None
         self.mouseY = None
-        while self.mouseX == None or self.mouseY == None:
-            self.update()
-            if self.isClosed(): raise GraphicsError("getMouse in closed window")
-            time.sleep(.1) # give up thread
+        clicked = self._waitFor(lambda: self.mouseX != None and self.mouseY != None,
+                                timeout)
+        if self.isClosed(): raise GraphicsError("getMouse in closed window")
+        if not clicked: return None
         x,y = self.toWorld(self.mouseX, self.mouseY)
         self.mouseX = None
         self.mouseY = None
@@ -333,13 +1077,14 @@ class GraphWin(tk.Canvas):
         else:
             return None
 
-    def getKey(self):
-        """Wait for user to press a key and return it as a string."""
+    def getKey(self, timeout=None):
+        """Wait for user to press a key and return it as a string.
+        If timeout (in seconds) is given and runs out before a key is
+        pressed, returns None."""
         self.lastKey = ""
-        while self.lastKey == "":
-            self.update()
-            if self.isClosed(): raise GraphicsError("getKey in closed window")
-            time.sleep(.1) # give up thread
+        pressed = self._waitFor(lambda: self.lastKey != "", timeout)
+        if self.isClosed(): raise GraphicsError("getKey in closed window")
+        if not pressed: return None
 
         key = self.lastKey
         self.lastKey = ""
@@ -375,6 +1120,24 @@ class GraphWin(tk.Canvas):
             return self.trans.world(x,y)
         else:
             return x,y
+
+    def toScreenMany(self, points):
+        """Convert a sequence of (x,y) pairs (or an (n,2) NumPy array)
+        to screen coordinates in one pass"""
+        trans = self.trans
+        if trans:
+            return trans.screen_many(points)
+        else:
+            return points
+
+    def toWorldMany(self, points):
+        """Convert a sequence of (xs,ys) screen pairs (or an (n,2)
+        NumPy array) to world coordinates in one pass"""
+        trans = self.trans
+        if trans:
+            return trans.world_many(points)
+        else:
+            return points
         
     def setMouseHandler(self, func):
         self._mouseCallback = func
@@ -382,22 +1145,1077 @@ class GraphWin(tk.Canvas):
     def _onClick(self, e):
         self.mouseX = e.x
         self.mouseY = e.y
+        self._inputEvent.set(1)
         if self._mouseCallback:
             self._mouseCallback(Point(e.x, e.y))
 
+    @property
+    def items(self):
+        """List of the objects drawn in the window, in drawing order"""
+        return list(self._items)
+
+    def getObject(self, id):
+        """Return the GraphicsObject drawn as Tk canvas item id, or
+        None if there is no such object in the window."""
+        return self._itemsById.get(id)
+
     def addItem(self, item):
-        self.items.append(item)
+        self._stackCount = self._stackCount + 1
+        self._items[item] = self._stackCount
+        if item.id is not None:
+            self._itemsById[item.id] = item
+        if self._index is not None:
+            self._index.insert(item)
+        if self._culling and item.id is not None:
+            self._placeShown(item)
 
     def delItem(self, item):
-        self.items.remove(item)
+        if self._culling and item.id is not None:
+            self._unshow(item)
+        del self._items[item]
+        self._pendingCreates.pop(item, None)
+        self._itemsById.pop(item.id, None)
+        self._groupTags.pop(item, None)
+        if self._index is not None:
+            self._index.remove(item)
+
+    def pick(self, point):
+        """Return the topmost object in the window whose shape contains
+        point (in world coordinates), or None. Lines, points and
+        outlines count within a couple of pixels."""
+        index = self._getIndex()
+        x, y = point.getX(), point.getY()
+        xs, ys = self.toScreen(x, y)
+        found = None
+        for obj in index.at(x, y):
+            if obj._contains(self, xs, ys, _PICK_TOLERANCE):
+                if found is None or self._stackKey(obj) > self._stackKey(found):
+                    found = obj
+        return found
+
+    def query(self, rect):
+        """Return the objects in the window whose bounding boxes overlap
+        rect (a Rectangle, in world coordinates), from bottom to top"""
+        p1, p2 = rect.getP1(), rect.getP2()
+        found = self._getIndex().overlapping(min(p1.x, p2.x), min(p1.y, p2.y),
+                                             max(p1.x, p2.x), max(p1.y, p2.y))
+        found.sort(key=self._stackKey)
+        return found
+
+    def _getIndex(self):
+        if self._index is None:
+            self._index = _GridIndex(self)
+            for item in self._items:
+                self._index.insert(item)
+        return self._index
+
+    def _stackKey(self, obj):
+        # Objects are stacked in the order they were drawn, lifted or
+        #   lowered; lowered objects have negative keys
+        return self._items[obj]
+
+    def _stackObject(self, obj, top):
+        # Raise or lower the items of obj, keeping their relative order
+        #   and the pixel layer at the bottom
+        self._settleCreates()
+        if obj.id is not None:
+            if top:
+                self.tag_raise(obj.id)
+            else:
+                self.tag_lower(obj.id)
+                if self._pixelItem is not None:
+                    self.tag_lower(self._pixelItem)
+        objs = sorted(obj._itemObjects(), key=self._stackKey)
+        if not top:
+            objs.reverse()
+        for item in objs:
+            if self._culling and item.id is not None:
+                self._unshow(item)
+            self._stackCount = self._stackCount + 1
+            self._items[item] = self._stackCount if top else -self._stackCount
+            if self._culling and item.id is not None:
+                self._insertShown(item)
+        self._autoflush()
+
+    def _pixelSize(self):
+        # Size of a pixel in world coordinates
+        trans = self.trans
+        if trans:
+            return abs(trans.xscale), abs(trans.yscale)
+        return 1.0, 1.0
+
+    def _pixelBox(self, p, width, height):
+        # World coordinate box of width by height pixels centered on p
+        px, py = self._pixelSize()
+        dx, dy = width*px/2.0, height*py/2.0
+        return p.x-dx, p.y-dy, p.x+dx, p.y+dy
+
+    def setCulling(self, enabled=True):
+        """Turn viewport culling on or off. While it is on, only objects
+        whose bounding boxes overlap the visible part of the window
+        have canvas items. Items are created as objects come into view,
+        through setCoords or move, and deleted as they leave it."""
+        self.__checkOpen()
+        if enabled == self._culling: return
+        self._settleCreates()
+        with self.batch():
+            if enabled:
+                self._getIndex()
+                self._view = self._viewport()
+                self._culling = True
+                self._shownKeys = []
+                self._shownObjs = []
+                for obj in sorted(self._items, key=self._stackKey):
+                    if self._inView(obj):
+                        self._insertShown(obj)
+                    else:
+                        self._hideItem(obj, False)
+            else:
+                for obj in sorted(self._items, key=self._stackKey):
+                    if obj.id is None:
+                        self._showItem(obj)
+                self._culling = False
+                self._shownKeys = self._shownObjs = None
+
+    def _viewport(self):
+        # The visible part of the window in world coordinates, with a
+        #   margin for line widths
+        m = _CULL_MARGIN
+        x1, y1 = self.toWorld(-m, -m)
+        x2, y2 = self.toWorld(self.width + m, self.height + m)
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def _inView(self, obj):
+        box = obj._bounds(self)
+        if box is None:
+            return True
+        x1, y1, x2, y2 = self._view
+        return box[0] <= x2 and x1 <= box[2] and box[1] <= y2 and y1 <= box[3]
+
+    def _cull(self, objs):
+        # Create or delete the items of objs as they enter or leave the
+        #   viewport
+        for obj in objs:
+            if self._inView(obj):
+                if obj.id is None:
+                    self._showItem(obj)
+            elif obj.id is not None:
+                self._hideItem(obj)
+
+    def _showItem(self, obj):
+        # Create the canvas item of a culled object, in its place in the
+        #   stacking order
+        obj.id = self._createItem(obj, self._groupTags.get(obj, ()))
+        self._itemsById[obj.id] = obj
+        self._placeShown(obj)
+
+    def _hideItem(self, obj, shown=True):
+        # Delete the canvas item of an object that left the viewport
+        if shown:
+            self._unshow(obj)
+        self._releaseItem(obj)
+        self._itemsById.pop(obj.id, None)
+        obj.id = None
+
+    def _placeShown(self, obj):
+        # Record a new item of obj and put it below the items stacked
+        #   above it (new items are created on top)
+        i = self._insertShown(obj)
+        if i + 1 < len(self._shownObjs):
+            self.tag_lower(obj.id, self._shownObjs[i+1].id)
+
+    def _insertShown(self, obj):
+        key = self._items[obj]
+        i = bisect.bisect(self._shownKeys, key)
+        self._shownKeys.insert(i, key)
+        self._shownObjs.insert(i, obj)
+        return i
+
+    def _unshow(self, obj):
+        i = bisect.bisect_left(self._shownKeys, self._items[obj])
+        del self._shownKeys[i]
+        del self._shownObjs[i]
+
+    def setPooling(self, enabled=True, size=1024):
+        """Turn item pooling on or off. While it is on, undrawing an
+        object hides its canvas item and keeps it, up to size items of
+        each kind, and drawing reuses a kept item of the same kind
+        instead of creating one. Turning pooling off deletes the kept
+        items."""
+        self.__checkOpen()
+        if enabled:
+            if self._pools is None:
+                self._pools = {}
+            self._poolSize = size
+        elif self._pools is not None:
+            pools = self._pools
+            self._pools = None
+            with self.batch():
+                for pool in pools.values():
+                    for id in pool:
+                        self._deleteItem(id)
+        self._autoflush()
+
+    def _poolKey(self, obj):
+        # Items are reused only by objects with the same item type and
+        #   option names, so every option of a reused item is reset
+        return obj._itemType, frozenset(obj._style.options)
+
+    def _createItem(self, obj, groupTags):
+        # Make the canvas item of obj, reusing a pooled item if there is
+        #   one. A reused item is raised to the top like a new one.
+        #   Inside a batch, new shapes are queued for _flushCreates and
+        #   have no id until then.
+        pool = None
+        if self._pools and obj._itemType is not None:
+            pool = self._pools.get(self._poolKey(obj))
+        if not pool and self._batchDepth and self._scriptCreates \
+                and obj._itemType is not None and not self._culling:
+            self._pendingCreates[obj] = groupTags
+            return None
+        self._settleCreates()
+        self._settleGroupMoves(groupTags)
+        if pool:
+            id = pool.pop()
+            self._pendingConfig.pop(id, None)
+            options = dict(obj._itemOptions(groupTags))
+            options.setdefault("tags", ())
+            options["state"] = "normal"
+            self.coords(id, *obj._coords(self))
+            self.itemconfig(id, options)
+            self.tag_raise(id)
+            return id
+        return obj._draw(self, obj._itemOptions(groupTags))
+
+    def _releaseItem(self, obj):
+        # Delete the canvas item of obj, or hide it and keep it for reuse
+        #   while pooling
+        id = obj.id
+        if self._pools is not None and obj._itemType is not None:
+            pool = self._pools.setdefault(self._poolKey(obj), [])
+            if len(pool) < self._poolSize:
+                # Untagged, so deletes and restyles by group or style tag
+                #   leave the pooled item alone
+                self._dropPending(id)
+                if self._batchDepth or not self.autoflush:
+                    self._configItem(id, {"state": "hidden", "tags": ()})
+                else:
+                    self.itemconfig(id, state="hidden", tags=())
+                pool.append(id)
+                return
+        self._deleteItem(id)
+
+    def setInstrumentation(self, enabled=True, report=None, file=None):
+        """Turn instrumentation on or off. While it is on, every canvas
+        operation and display update of the window is counted and
+        timed, by operation and by the class of the object it was
+        made for; getStats returns the figures. If report is a number
+        of seconds, a summary is printed to file (sys.stderr by
+        default) at most that often, as the window updates.
+        Instrumentation costs nothing while it is off."""
+        for name in _INSTRUMENTED + _ATTRIBUTED:
+            self.__dict__.pop(name, None)
+        if not enabled:
+            self._reportEvery = None
+            return
+        self._stats = {}
+        self._statsStart = self._lastReport = _clock()
+        self._reportEvery = report
+        self._reportFile = file
+        context = [""]  # class of the object operations are made for
+        for name in _ATTRIBUTED:
+            self._attribute(name, context)
+        for name in _INSTRUMENTED:
+            self._instrument(name, context)
+
+    def _attribute(self, name, context):
+        # Shadow method name with a wrapper that sets the class the
+        #   operations it makes are counted for
+        method = getattr(self, name)
+        def attributed(*args, **kw):
+            outer = context[0]
+            if args and isinstance(args[0], GraphicsObject):
+                context[0] = type(args[0]).__name__
+            else:
+                context[0] = ""
+            try:
+                return method(*args, **kw)
+            finally:
+                context[0] = outer
+        setattr(self, name, attributed)
+
+    def _instrument(self, name, context):
+        # Shadow method name with a timing wrapper on this window only
+        method = getattr(self, name)
+        operation = name.lstrip("_")
+        isUpdate = operation in ("update", "update_idletasks", "refresh")
+        byItem = not operation.startswith("create_")  # first argument is an item
+        stats = self._stats
+        byId = self._itemsById
+        def timed(*args, **kw):
+            if byItem and args and isinstance(args[0], int) and args[0] in byId:
+                cls = type(byId[args[0]]).__name__
+            else:
+                cls = context[0]
+            start = _clock()
+            try:
+                return method(*args, **kw)
+            finally:
+                elapsed = _clock() - start
+                entry = stats.get((operation, cls))
+                if entry is None:
+                    stats[operation, cls] = [1, elapsed, elapsed]
+                else:
+                    entry[0] += 1
+                    entry[1] += elapsed
+                    if elapsed > entry[2]:
+                        entry[2] = elapsed
+                if isUpdate and self._reportEvery is not None:
+                    self._reportStats()
+        setattr(self, name, timed)
+
+    def getStats(self):
+        """Return a dictionary of instrumentation figures: "elapsed",
+        the seconds since instrumentation was turned on or reset, and
+        "operations", mapping each operation name to its "calls",
+        total "time" and "max" time in seconds and per-class
+        "classes" figures. Nested operations (such as the item
+        updates made by a flush) count in both."""
+        operations = {}
+        for (operation, cls), (calls, total, most) in sorted((self._stats or {}).items()):
+            entry = operations.get(operation)
+            if entry is None:
+                entry = operations[operation] = {"calls": 0, "time": 0.0,
+                                                 "max": 0.0, "classes": {}}
+            entry["calls"] += calls
+            entry["time"] += total
+            entry["max"] = max(entry["max"], most)
+            entry["classes"][cls or "GraphWin"] = {"calls": calls, "time": total}
+        elapsed = _clock() - self._statsStart if self._statsStart else 0.0
+        return {"elapsed": elapsed, "operations": operations}
+
+    def resetStats(self):
+        """Clear the instrumentation figures"""
+        if self._stats is not None:
+            self._stats.clear()
+            self._statsStart = self._lastReport = _clock()
+
+    def printStats(self, file=None):
+        """Print a summary of the instrumentation figures, slowest
+        operations first"""
+        file = file or sys.stderr
+        stats = self.getStats()
+        print("{} over {:.2f} s:".format(self, stats["elapsed"]), file=file)
+        rows = sorted(stats["operations"].items(), key=lambda item: -item[1]["time"])
+        for operation, entry in rows:
+            classes = ", ".join("{} {}".format(cls, figures["calls"])
+                for cls, figures in sorted(entry["classes"].items(),
+                                           key=lambda item: -item[1]["time"]))
+            print("  {:<18} {:>8} calls {:>10.2f} ms  max {:>8.3f} ms  ({})".format(
+                operation, entry["calls"], entry["time"]*1000,
+                entry["max"]*1000, classes), file=file)
+
+    def _reportStats(self):
+        now = _clock()
+        if now - self._lastReport >= self._reportEvery:
+            self._lastReport = now
+            self.printStats(self._reportFile)
+
+    def _settleGroupMoves(self, tags):
+        # A group move still queued for the group tags would also move
+        #   an item created with those tags now
+        if tags and self._pendingMoves:
+            self._flushMoves()
+
+    def _reproject(self):
+        # Move the drawn items to their places under the current
+        #   transform. Canvas items are kept, so ids, stacking order and
+        #   options stay the same; objects that cannot report their
+        #   screen coordinates are redrawn instead. Queued moves are
+        #   already part of the objects' coordinates. With culling, only
+        #   the items in view are touched.
+        self._pendingMoves = {}
+        with self.batch():
+            items = self._items
+            if self._culling:
+                self._view = self._viewport()
+                for obj in list(self._shownObjs):
+                    if not self._inView(obj):
+                        self._hideItem(obj)
+                items = list(self._shownObjs)
+                for obj in self._getIndex().overlapping(*self._view):
+                    if obj.id is None:
+                        self._showItem(obj)
+            for item in list(items):
+                coords = item._coords(self)
+                if coords is None:
+                    tags = self._groupTags.get(item, ())
+                    item.undraw()
+                    item._drawTagged(self, tags)
+                elif item.id is not None:
+                    self.coords(item.id, *coords)
+
+    def restyle(self, style, **changes):
+        """Change the given options of every object in the window that
+        uses style, with one canvas call. Returns the new Style."""
+        self.__checkOpen()
+        new = style.replace(**changes)
+        if new is style: return style
+        self._flushPending()
+        for item in self._items:
+            if item._style is style:
+                item._style = new
+        self.itemconfig(style.tag, changes)
+        self.addtag_withtag(new.tag, style.tag)
+        self.dtag(style.tag, style.tag)
+        self._autoflush()
+        return new
 
     def redraw(self):
-        for item in self.items[:]:
-            item.undraw()
-            item.draw(self)
+        with self.batch():
+            for item in sorted(self._items, key=self._stackKey):
+                tags = self._groupTags.get(item, ())
+                item.undraw()
+                item._drawTagged(self, tags)
         self.update()
         
                       
+# The color names Tk knows, with their Tk 8.6 values: the X11 colors,
+#   except the web values for gray, green, maroon and purple, and the
+#   web names Tk adds. Pairs of name and rrggbb, made into _COLORS on
+#   first use; grayN and greyN are computed.
+_COLOR_TABLE = """
+aliceblue f0f8ff antiquewhite faebd7 antiquewhite1 ffefdb
+antiquewhite2 eedfcc antiquewhite3 cdc0b0 antiquewhite4 8b8378 aqua 00ffff
+aquamarine 7fffd4 aquamarine1 7fffd4 aquamarine2 76eec6 aquamarine3 66cdaa
+aquamarine4 458b74 azure f0ffff azure1 f0ffff azure2 e0eeee azure3 c1cdcd
+azure4 838b8b beige f5f5dc bisque ffe4c4 bisque1 ffe4c4 bisque2 eed5b7
+bisque3 cdb79e bisque4 8b7d6b black 000000 blanchedalmond ffebcd blue 0000ff
+blue1 0000ff blue2 0000ee blue3 0000cd blue4 00008b blueviolet 8a2be2
+brown a52a2a brown1 ff4040 brown2 ee3b3b brown3 cd3333 brown4 8b2323
+burlywood deb887 burlywood1 ffd39b burlywood2 eec591 burlywood3 cdaa7d
+burlywood4 8b7355 cadetblue 5f9ea0 cadetblue1 98f5ff cadetblue2 8ee5ee
+cadetblue3 7ac5cd cadetblue4 53868b chartreuse 7fff00 chartreuse1 7fff00
+chartreuse2 76ee00 chartreuse3 66cd00 chartreuse4 458b00 chocolate d2691e
+chocolate1 ff7f24 chocolate2 ee7621 chocolate3 cd661d chocolate4 8b4513
+coral ff7f50 coral1 ff7256 coral2 ee6a50 coral3 cd5b45 coral4 8b3e2f
+cornflowerblue 6495ed cornsilk fff8dc cornsilk1 fff8dc cornsilk2 eee8cd
+cornsilk3 cdc8b1 cornsilk4 8b8878 crimson dc143c cyan 00ffff cyan1 00ffff
+cyan2 00eeee cyan3 00cdcd cyan4 008b8b darkblue 00008b darkcyan 008b8b
+darkgoldenrod b8860b darkgoldenrod1 ffb90f darkgoldenrod2 eead0e
+darkgoldenrod3 cd950c darkgoldenrod4 8b6508 darkgray a9a9a9 darkgreen 006400
+darkgrey a9a9a9 darkkhaki bdb76b darkmagenta 8b008b darkolivegreen 556b2f
+darkolivegreen1 caff70 darkolivegreen2 bcee68 darkolivegreen3 a2cd5a
+darkolivegreen4 6e8b3d darkorange ff8c00 darkorange1 ff7f00
+darkorange2 ee7600 darkorange3 cd6600 darkorange4 8b4500 darkorchid 9932cc
+darkorchid1 bf3eff darkorchid2 b23aee darkorchid3 9a32cd darkorchid4 68228b
+darkred 8b0000 darksalmon e9967a darkseagreen 8fbc8f darkseagreen1 c1ffc1
+darkseagreen2 b4eeb4 darkseagreen3 9bcd9b darkseagreen4 698b69
+darkslateblue 483d8b darkslategray 2f4f4f darkslategray1 97ffff
+darkslategray2 8deeee darkslategray3 79cdcd darkslategray4 528b8b
+darkslategrey 2f4f4f darkturquoise 00ced1 darkviolet 9400d3 debianred d70751
+deeppink ff1493 deeppink1 ff1493 deeppink2 ee1289 deeppink3 cd1076
+deeppink4 8b0a50 deepskyblue 00bfff deepskyblue1 00bfff deepskyblue2 00b2ee
+deepskyblue3 009acd deepskyblue4 00688b dimgray 696969 dimgrey 696969
+dodgerblue 1e90ff dodgerblue1 1e90ff dodgerblue2 1c86ee dodgerblue3 1874cd
+dodgerblue4 104e8b firebrick b22222 firebrick1 ff3030 firebrick2 ee2c2c
+firebrick3 cd2626 firebrick4 8b1a1a floralwhite fffaf0 forestgreen 228b22
+fuchsia ff00ff gainsboro dcdcdc ghostwhite f8f8ff gold ffd700 gold1 ffd700
+gold2 eec900 gold3 cdad00 gold4 8b7500 goldenrod daa520 goldenrod1 ffc125
+goldenrod2 eeb422 goldenrod3 cd9b1d goldenrod4 8b6914 gray 808080
+green 008000 green1 00ff00 green2 00ee00 green3 00cd00 green4 008b00
+greenyellow adff2f grey 808080 honeydew f0fff0 honeydew1 f0fff0
+honeydew2 e0eee0 honeydew3 c1cdc1 honeydew4 838b83 hotpink ff69b4
+hotpink1 ff6eb4 hotpink2 ee6aa7 hotpink3 cd6090 hotpink4 8b3a62
+indianred cd5c5c indianred1 ff6a6a indianred2 ee6363 indianred3 cd5555
+indianred4 8b3a3a indigo 4b0082 ivory fffff0 ivory1 fffff0 ivory2 eeeee0
+ivory3 cdcdc1 ivory4 8b8b83 khaki f0e68c khaki1 fff68f khaki2 eee685
+khaki3 cdc673 khaki4 8b864e lavender e6e6fa lavenderblush fff0f5
+lavenderblush1 fff0f5 lavenderblush2 eee0e5 lavenderblush3 cdc1c5
+lavenderblush4 8b8386 lawngreen 7cfc00 lemonchiffon fffacd
+lemonchiffon1 fffacd lemonchiffon2 eee9bf lemonchiffon3 cdc9a5
+lemonchiffon4 8b8970 lightblue add8e6 lightblue1 bfefff lightblue2 b2dfee
+lightblue3 9ac0cd lightblue4 68838b lightcoral f08080 lightcyan e0ffff
+lightcyan1 e0ffff lightcyan2 d1eeee lightcyan3 b4cdcd lightcyan4 7a8b8b
+lightgoldenrod eedd82 lightgoldenrod1 ffec8b lightgoldenrod2 eedc82
+lightgoldenrod3 cdbe70 lightgoldenrod4 8b814c lightgoldenrodyellow fafad2
+lightgray d3d3d3 lightgreen 90ee90 lightgrey d3d3d3 lightpink ffb6c1
+lightpink1 ffaeb9 lightpink2 eea2ad lightpink3 cd8c95 lightpink4 8b5f65
+lightsalmon ffa07a lightsalmon1 ffa07a lightsalmon2 ee9572
+lightsalmon3 cd8162 lightsalmon4 8b5742 lightseagreen 20b2aa
+lightskyblue 87cefa lightskyblue1 b0e2ff lightskyblue2 a4d3ee
+lightskyblue3 8db6cd lightskyblue4 607b8b lightslateblue 8470ff
+lightslategray 778899 lightslategrey 778899 lightsteelblue b0c4de
+lightsteelblue1 cae1ff lightsteelblue2 bcd2ee lightsteelblue3 a2b5cd
+lightsteelblue4 6e7b8b lightyellow ffffe0 lightyellow1 ffffe0
+lightyellow2 eeeed1 lightyellow3 cdcdb4 lightyellow4 8b8b7a lime 00ff00
+limegreen 32cd32 linen faf0e6 magenta ff00ff magenta1 ff00ff magenta2 ee00ee
+magenta3 cd00cd magenta4 8b008b maroon 800000 maroon1 ff34b3 maroon2 ee30a7
+maroon3 cd2990 maroon4 8b1c62 mediumaquamarine 66cdaa mediumblue 0000cd
+mediumorchid ba55d3 mediumorchid1 e066ff mediumorchid2 d15fee
+mediumorchid3 b452cd mediumorchid4 7a378b mediumpurple 9370db
+mediumpurple1 ab82ff mediumpurple2 9f79ee mediumpurple3 8968cd
+mediumpurple4 5d478b mediumseagreen 3cb371 mediumslateblue 7b68ee
+mediumspringgreen 00fa9a mediumturquoise 48d1cc mediumvioletred c71585
+midnightblue 191970 mintcream f5fffa mistyrose ffe4e1 mistyrose1 ffe4e1
+mistyrose2 eed5d2 mistyrose3 cdb7b5 mistyrose4 8b7d7b moccasin ffe4b5
+navajowhite ffdead navajowhite1 ffdead navajowhite2 eecfa1
+navajowhite3 cdb38b navajowhite4 8b795e navy 000080 navyblue 000080
+oldlace fdf5e6 olive 808000 olivedrab 6b8e23 olivedrab1 c0ff3e
+olivedrab2 b3ee3a olivedrab3 9acd32 olivedrab4 698b22 orange ffa500
+orange1 ffa500 orange2 ee9a00 orange3 cd8500 orange4 8b5a00 orangered ff4500
+orangered1 ff4500 orangered2 ee4000 orangered3 cd3700 orangered4 8b2500
+orchid da70d6 orchid1 ff83fa orchid2 ee7ae9 orchid3 cd69c9 orchid4 8b4789
+palegoldenrod eee8aa palegreen 98fb98 palegreen1 9aff9a palegreen2 90ee90
+palegreen3 7ccd7c palegreen4 548b54 paleturquoise afeeee
+paleturquoise1 bbffff paleturquoise2 aeeeee paleturquoise3 96cdcd
+paleturquoise4 668b8b palevioletred db7093 palevioletred1 ff82ab
+palevioletred2 ee799f palevioletred3 cd6889 palevioletred4 8b475d
+papayawhip ffefd5 peachpuff ffdab9 peachpuff1 ffdab9 peachpuff2 eecbad
+peachpuff3 cdaf95 peachpuff4 8b7765 peru cd853f pink ffc0cb pink1 ffb5c5
+pink2 eea9b8 pink3 cd919e pink4 8b636c plum dda0dd plum1 ffbbff plum2 eeaeee
+plum3 cd96cd plum4 8b668b powderblue b0e0e6 purple 800080 purple1 9b30ff
+purple2 912cee purple3 7d26cd purple4 551a8b red ff0000 red1 ff0000
+red2 ee0000 red3 cd0000 red4 8b0000 rosybrown bc8f8f rosybrown1 ffc1c1
+rosybrown2 eeb4b4 rosybrown3 cd9b9b rosybrown4 8b6969 royalblue 4169e1
+royalblue1 4876ff royalblue2 436eee royalblue3 3a5fcd royalblue4 27408b
+saddlebrown 8b4513 salmon fa8072 salmon1 ff8c69 salmon2 ee8262
+salmon3 cd7054 salmon4 8b4c39 sandybrown f4a460 seagreen 2e8b57
+seagreen1 54ff9f seagreen2 4eee94 seagreen3 43cd80 seagreen4 2e8b57
+seashell fff5ee seashell1 fff5ee seashell2 eee5de seashell3 cdc5bf
+seashell4 8b8682 sienna a0522d sienna1 ff8247 sienna2 ee7942 sienna3 cd6839
+sienna4 8b4726 silver c0c0c0 skyblue 87ceeb skyblue1 87ceff skyblue2 7ec0ee
+skyblue3 6ca6cd skyblue4 4a708b slateblue 6a5acd slateblue1 836fff
+slateblue2 7a67ee slateblue3 6959cd slateblue4 473c8b slategray 708090
+slategray1 c6e2ff slategray2 b9d3ee slategray3 9fb6cd slategray4 6c7b8b
+slategrey 708090 snow fffafa snow1 fffafa snow2 eee9e9 snow3 cdc9c9
+snow4 8b8989 springgreen 00ff7f springgreen1 00ff7f springgreen2 00ee76
+springgreen3 00cd66 springgreen4 008b45 steelblue 4682b4 steelblue1 63b8ff
+steelblue2 5cacee steelblue3 4f94cd steelblue4 36648b tan d2b48c tan1 ffa54f
+tan2 ee9a49 tan3 cd853f tan4 8b5a2b teal 008080 thistle d8bfd8
+thistle1 ffe1ff thistle2 eed2ee thistle3 cdb5cd thistle4 8b7b8b
+tomato ff6347 tomato1 ff6347 tomato2 ee5c42 tomato3 cd4f39 tomato4 8b3626
+turquoise 40e0d0 turquoise1 00f5ff turquoise2 00e5ee turquoise3 00c5cd
+turquoise4 00868b violet ee82ee violetred d02090 violetred1 ff3e96
+violetred2 ee3a8c violetred3 cd3278 violetred4 8b2252 wheat f5deb3
+wheat1 ffe7ba wheat2 eed8ae wheat3 cdba96 wheat4 8b7e66 white ffffff
+whitesmoke f5f5f5 yellow ffff00 yellow1 ffff00 yellow2 eeee00 yellow3 cdcd00
+yellow4 8b8b00 yellowgreen 9acd32
+"""
+
+_COLORS = None
+
+_colorCache = {}
+
+def _colors():
+    global _COLORS
+    if _COLORS is None:
+        words = _COLOR_TABLE.split()
+        _COLORS = dict((name, tuple(bytes.fromhex(value)))
+                       for name, value in zip(words[::2], words[1::2]))
+    return _COLORS
+
+def _rgb(color):
+    # Returns color (a color name or #rgb specifier) as an (r,g,b)
+    #   tuple, or None for "" (no color)
+    try:
+        return _colorCache[color]
+    except KeyError:
+        pass
+    spec = color.replace(" ", "").lower()
+    if spec == "":
+        rgb = None
+    elif spec.startswith("#") and len(spec) in (4, 7, 13):
+        n = (len(spec) - 1) // 3
+        try:
+            rgb = tuple(int(spec[1+i*n:1+(i+1)*n], 16) * 255 // (16**n - 1)
+                        for i in range(3))
+        except ValueError:
+            raise GraphicsError("Unknown color: " + color)
+    elif spec in _colors():
+        rgb = _COLORS[spec]
+    elif spec[:4] in ("gray", "grey") and spec[4:].isdigit() and int(spec[4:]) <= 100:
+        level = int(int(spec[4:]) * 2.55 + 0.5)
+        rgb = (level, level, level)
+    else:
+        raise GraphicsError("Unknown color: " + color)
+    _colorCache[color] = rgb
+    return rgb
+
+def _flattenArgs(args, kw):
+    # Splits canvas create/coords arguments, in any of the forms tkinter
+    #   accepts, into a flat list of coordinates and an options dict
+    coords = []
+    options = {}
+    for arg in args:
+        if isinstance(arg, dict):
+            options.update(arg)
+        elif isinstance(arg, (list, tuple)):
+            more, opts = _flattenArgs(arg, {})
+            coords.extend(more)
+            options.update(opts)
+        else:
+            coords.append(float(arg))
+    options.update(kw)
+    return coords, options
+
+# Options Tk gives canvas items that are not configured
+_ITEM_DEFAULTS = {
+    "line": {"fill": "black", "width": 1},
+    "rectangle": {"fill": "", "outline": "black", "width": 1},
+    "oval": {"fill": "", "outline": "black", "width": 1},
+    "polygon": {"fill": "black", "outline": "", "width": 1},
+    "text": {"fill": "black"},
+    "image": {"anchor": "center"}}
+
+# Pixel layer colors as rgb bytes
+_pixelColors = {}
+
+
+class RasterWin(GraphWin):
+
+    """A window for the raster backend: drawing goes into an in-memory
+    rgb pixel buffer instead of a Tk window, so no display is needed.
+
+    The canvas operations used by the graphics objects are implemented
+    here over a list of items, which is rasterized on demand by
+    getPixels or save. Lines, rectangles, ovals, polygons, points and
+    images are rendered with the same coordinates (and Transform) as
+    on the Tk canvas; Text items are kept but not rendered, and Entry
+    objects are not supported. There is no mouse or keyboard input."""
+
+    # Items are created directly, there is no Tcl to script
+    _scriptCreates = False
+
+    def __init__(self, title="Graphics Window",
+                 width=200, height=200, autoflush=True, backend=None):
+        assert type(title) == type(""), "Title must be a string"
+        self._title = title
+        self._background = (255, 255, 255)
+        self._rasterItems = {}  # id -> [type, coords, options, tags], in stacking order
+        self._nextId = 1
+        self._initState(width, height, autoflush)
+
+    def __repr__(self):
+        if self.isClosed():
+            return "<Closed RasterWin>"
+        else:
+            return "RasterWin('{}', {}, {})".format(self._title,
+                                              self.getWidth(),
+                                              self.getHeight())
+
+    def _refresh(self):
+        pass
+
+    def close(self):
+        """Close the window"""
+        self.closed = True
+        self._dropCommands()
+
+    def update(self):
+        self.processCommands()
+        self._flushPending()
+
+    def update_idletasks(self):
+        self.processCommands()
+        self._flushPending()
+
+    def _pollCommands(self):
+        pass
+
+    def _wakeTk(self):
+        pass
+
+    def _scheduleFlush(self):
+        # Queued changes are sent before the window is rendered
+        pass
+
+    def getMouse(self, timeout=None):
+        raise GraphicsError("No mouse input in a raster window")
+
+    def getKey(self, timeout=None):
+        raise GraphicsError("No keyboard input in a raster window")
+
+    # Canvas operations
+
+    def config(self, cnf=None, **kw):
+        options = dict(cnf or {}, **kw)
+        for option in ("bg", "background"):
+            if option in options:
+                self._background = _rgb(options[option]) or (255, 255, 255)
+
+    configure = config
+
+    def _checkColors(self, options):
+        # Unknown colors are reported when they are set, as Tk does,
+        #   not when the window is rendered
+        for option in ("fill", "outline"):
+            if option in options:
+                _rgb(options[option])
+
+    def _create(self, kind, args, kw):
+        coords, options = _flattenArgs(args, kw)
+        self._checkColors(options)
+        config = dict(_ITEM_DEFAULTS[kind])
+        config.update(options)
+        tags = config.pop("tags", ())
+        if isinstance(tags, str):
+            tags = tags.split()
+        id = self._nextId
+        self._nextId = id + 1
+        self._rasterItems[id] = [kind, coords, config, list(tags)]
+        return id
+
+    def create_line(self, *args, **kw):
+        return self._create("line", args, kw)
+
+    def create_rectangle(self, *args, **kw):
+        return self._create("rectangle", args, kw)
+
+    def create_oval(self, *args, **kw):
+        return self._create("oval", args, kw)
+
+    def create_polygon(self, *args, **kw):
+        return self._create("polygon", args, kw)
+
+    def create_text(self, *args, **kw):
+        return self._create("text", args, kw)
+
+    def create_image(self, *args, **kw):
+        return self._create("image", args, kw)
+
+    def create_window(self, *args, **kw):
+        raise GraphicsError("Entry objects need the tk backend")
+
+    def _colorRGB(self, color):
+        return _rgb(color)
+
+    def _backgroundRGB(self):
+        return self._background
+
+    def _newPhoto(self, data, width, height):
+        return _RasterPhoto(data, width, height)
+
+    def _photo(self, img):
+        return img
+
+    def _putRows(self, data, y, height):
+        self._pixelImage.putRGB(data, 0, y, self.width, height)
+
+    def _find(self, tagOrId):
+        # Returns the ids of the items matching tagOrId, in stacking order
+        items = self._rasterItems
+        if tagOrId == "all":
+            return list(items)
+        if isinstance(tagOrId, int) or str(tagOrId).isdigit():
+            id = int(tagOrId)
+            return [id] if id in items else []
+        if "&&" in tagOrId:
+            # A conjunction of tags, as in Tk tag expressions
+            tags = tagOrId.split("&&")
+            return [id for id, item in items.items()
+                    if all(tag in item[3] for tag in tags)]
+        return [id for id, item in items.items() if tagOrId in item[3]]
+
+    def find_all(self):
+        return tuple(self._rasterItems)
+
+    def type(self, tagOrId):
+        ids = self._find(tagOrId)
+        return self._rasterItems[ids[0]][0] if ids else None
+
+    def delete(self, *tagsOrIds):
+        for tagOrId in tagsOrIds:
+            for id in self._find(tagOrId):
+                del self._rasterItems[id]
+
+    def move(self, tagOrId, dx, dy):
+        for id in self._find(tagOrId):
+            coords = self._rasterItems[id][1]
+            for i in range(0, len(coords), 2):
+                coords[i] = coords[i] + dx
+                coords[i+1] = coords[i+1] + dy
+
+    def scale(self, tagOrId, xorigin, yorigin, xscale, yscale):
+        for id in self._find(tagOrId):
+            coords = self._rasterItems[id][1]
+            for i in range(0, len(coords), 2):
+                coords[i] = xorigin + (coords[i] - xorigin)*xscale
+                coords[i+1] = yorigin + (coords[i+1] - yorigin)*yscale
+
+    def coords(self, tagOrId, *args):
+        ids = self._find(tagOrId)
+        if not args:
+            return list(self._rasterItems[ids[0]][1]) if ids else []
+        coords = _flattenArgs(args, {})[0]
+        for id in ids:
+            self._rasterItems[id][1] = list(coords)
+
+    def itemconfig(self, tagOrId, cnf=None, **kw):
+        options = dict(cnf or {}, **kw)
+        self._checkColors(options)
+        tags = options.pop("tags", None)
+        if isinstance(tags, str):
+            tags = tags.split()
+        for id in self._find(tagOrId):
+            item = self._rasterItems[id]
+            item[2].update(options)
+            if tags is not None:
+                item[3] = list(tags)
+
+    itemconfigure = itemconfig
+
+    def itemcget(self, tagOrId, option):
+        ids = self._find(tagOrId)
+        if not ids:
+            return ""
+        if option == "tags":
+            return " ".join(self._rasterItems[ids[0]][3])
+        return self._rasterItems[ids[0]][2].get(option, "")
+
+    def gettags(self, tagOrId):
+        ids = self._find(tagOrId)
+        return tuple(self._rasterItems[ids[0]][3]) if ids else ()
+
+    def addtag_withtag(self, newtag, tagOrId):
+        for id in self._find(tagOrId):
+            tags = self._rasterItems[id][3]
+            if newtag not in tags:
+                tags.append(newtag)
+
+    def dtag(self, tagOrId, tagToDelete=None):
+        if tagToDelete is None:
+            tagToDelete = tagOrId
+        for id in self._find(tagOrId):
+            tags = self._rasterItems[id][3]
+            while tagToDelete in tags:
+                tags.remove(tagToDelete)
+
+    def _restack(self, ids, reference, above):
+        # Moves items ids next to the reference item, or to the top or
+        #   bottom if there is no reference
+        if not ids:
+            return
+        moved = set(ids)
+        order = [id for id in self._rasterItems if id not in moved]
+        if reference is None:
+            pos = len(order) if above else 0
+        else:
+            refs = [id for id in self._find(reference) if id not in moved]
+            if not refs:
+                return
+            pos = order.index(refs[-1]) + 1 if above else order.index(refs[0])
+        order[pos:pos] = ids
+        items = self._rasterItems
+        self._rasterItems = dict((id, items[id]) for id in order)
+
+    def tag_raise(self, tagOrId, aboveThis=None):
+        self._restack(self._find(tagOrId), aboveThis, True)
+
+    def tag_lower(self, tagOrId, belowThis=None):
+        self._restack(self._find(tagOrId), belowThis, False)
+
+    # Rasterization
+
+    def getPixels(self):
+        """Returns the contents of the window as a NumPy uint8 array of
+        shape (height, width, 3), or as bytes of rgb rows if NumPy is
+        not installed"""
+        data = self._render()
+        np = _numpy()
+        if np is None:
+            return bytes(data)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3).copy()
+
+    def save(self, filename):
+        """Saves the contents of the window to filename (ppm, pgm or png)"""
+        savePixels(filename, self._render(), self.width, self.height)
+
+    def _render(self):
+        self._flushPending()
+        buf = bytearray(bytes(bytearray(self._background)) * (self.width*self.height))
+        for kind, coords, options, tags in self._rasterItems.values():
+            if options.get("state") == "hidden":
+                continue
+            render = getattr(self, "_render_" + kind, None)
+            if render:
+                render(buf, coords, options)
+        return buf
+
+    def _span(self, buf, y, x1, x2, color):
+        # Sets pixels x1..x2 (inclusive) of row y, clipped to the window
+        if y < 0 or y >= self.height:
+            return
+        if x1 < 0: x1 = 0
+        if x2 >= self.width: x2 = self.width - 1
+        if x1 > x2:
+            return
+        start = 3*(y*self.width + x1)
+        buf[start:start + 3*(x2-x1+1)] = color * (x2-x1+1)
+
+    def _pixel(self, buf, x, y, color):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            start = 3*(y*self.width + x)
+            buf[start:start+3] = color
+
+    def _fillPolygon(self, buf, coords, color):
+        # Even-odd scanline fill, sampling at pixel centers
+        n = len(coords) // 2
+        if n < 3:
+            return
+        xs = coords[0::2]
+        ys = coords[1::2]
+        ymin = max(int(min(ys)), 0)
+        ymax = min(int(max(ys)) + 1, self.height - 1)
+        for y in range(ymin, ymax + 1):
+            yc = y + 0.5
+            crossings = []
+            for i in range(n):
+                x1, y1 = xs[i-1], ys[i-1]
+                x2, y2 = xs[i], ys[i]
+                if (y1 <= yc < y2) or (y2 <= yc < y1):
+                    crossings.append(x1 + (yc-y1)*(x2-x1)/(y2-y1))
+            crossings.sort()
+            for i in range(0, len(crossings) - 1, 2):
+                left = int(crossings[i] + 0.5)
+                right = int(crossings[i+1] + 0.5) - 1
+                self._span(buf, y, left, right, color)
+
+    def _strokeLine(self, buf, x1, y1, x2, y2, width, color, last=False):
+        # Draws a line segment of the given width. As on the Tk canvas,
+        #   a thin line does not include its end point unless last is set.
+        if width > 1:
+            dx, dy = x2-x1, y2-y1
+            length = (dx*dx + dy*dy) ** 0.5
+            if length == 0:
+                return
+            nx, ny = -dy/length*width/2.0, dx/length*width/2.0
+            self._fillPolygon(buf, [x1+nx, y1+ny, x2+nx, y2+ny,
+                                    x2-nx, y2-ny, x1-nx, y1-ny], color)
+            return
+        x1, y1, x2, y2 = int(round(x1)), int(round(y1)), int(round(x2)), int(round(y2))
+        dx, dy = abs(x2-x1), -abs(y2-y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while x1 != x2 or y1 != y2:
+            self._pixel(buf, x1, y1, color)
+            e2 = 2*err
+            if e2 >= dy:
+                err = err + dy
+                x1 = x1 + sx
+            if e2 <= dx:
+                err = err + dx
+                y1 = y1 + sy
+        if last:
+            self._pixel(buf, x2, y2, color)
+
+    def _render_line(self, buf, coords, options):
+        color = _rgb(options.get("fill", ""))
+        if color is None:
+            return
+        color = bytes(bytearray(color))
+        width = float(options.get("width", 1))
+        for i in range(0, len(coords) - 2, 2):
+            self._strokeLine(buf, coords[i], coords[i+1], coords[i+2], coords[i+3],
+                             width, color)
+
+    def _render_rectangle(self, buf, coords, options):
+        x1, y1, x2, y2 = [int(round(c)) for c in coords[:4]]
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        fill = _rgb(options.get("fill", ""))
+        outline = _rgb(options.get("outline", ""))
+        lw = int(round(float(options.get("width", 1)))) if outline else 0
+        if fill:
+            fill = bytes(bytearray(fill))
+            for y in range(y1 + lw, y2 - lw + 1):
+                self._span(buf, y, x1 + lw, x2 - lw, fill)
+        if outline and lw:
+            outline = bytes(bytearray(outline))
+            for y in range(y1, y2 + 1):
+                if y < y1 + lw or y > y2 - lw:
+                    self._span(buf, y, x1, x2, outline)
+                else:
+                    self._span(buf, y, x1, x1 + lw - 1, outline)
+                    self._span(buf, y, x2 - lw + 1, x2, outline)
+
+    def _render_oval(self, buf, coords, options):
+        x1, y1, x2, y2 = coords[:4]
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        fill = _rgb(options.get("fill", ""))
+        outline = _rgb(options.get("outline", ""))
+        lw = float(options.get("width", 1)) if outline else 0
+        cx, cy = (x1 + x2)/2.0, (y1 + y2)/2.0
+        rx, ry = (x2 - x1)/2.0 + 0.5, (y2 - y1)/2.0 + 0.5
+        fill = fill and bytes(bytearray(fill))
+        outline = outline and bytes(bytearray(outline))
+
+        def halfWidth(rx, ry, y):
+            # half width of the ellipse at the center of row y
+            if rx <= 0 or ry <= 0:
+                return None
+            t = (y + 0.5 - cy)/ry
+            if t*t >= 1:
+                return None
+            return rx * (1 - t*t) ** 0.5
+
+        for y in range(int(cy - ry), int(cy + ry) + 1):
+            outer = halfWidth(rx, ry, y)
+            if outer is None:
+                continue
+            inner = halfWidth(rx - lw, ry - lw, y)
+            left = int(cx - outer + 0.5)
+            right = int(cx + outer + 0.5) - 1
+            if inner is None:
+                self._span(buf, y, left, right, outline or fill)
+                continue
+            ileft = int(cx - inner + 0.5)
+            iright = int(cx + inner + 0.5) - 1
+            if fill:
+                self._span(buf, y, ileft, iright, fill)
+            if outline:
+                self._span(buf, y, left, ileft - 1, outline)
+                self._span(buf, y, iright + 1, right, outline)
+
+    def _render_polygon(self, buf, coords, options):
+        fill = _rgb(options.get("fill", ""))
+        if fill:
+            self._fillPolygon(buf, coords, bytes(bytearray(fill)))
+        outline = _rgb(options.get("outline", ""))
+        if outline:
+            outline = bytes(bytearray(outline))
+            width = float(options.get("width", 1))
+            n = len(coords)
+            for i in range(0, n, 2):
+                self._strokeLine(buf, coords[i], coords[i+1],
+                                 coords[(i+2) % n], coords[(i+3) % n],
+                                 width, outline, last=True)
+
+    def _render_image(self, buf, coords, options):
+        img = options.get("image")
+        if img is None:
+            return
+        iw, ih = img.width(), img.height()
+        if not isinstance(img, _RasterPhoto):
+            img = _RasterPhoto(_tkPhotoRead(img, 0, 0, iw, ih), iw, ih)
+        src = img.getRGB(0, 0, iw, ih)
+        left = int(round(coords[0]))
+        top = int(round(coords[1]))
+        if options.get("anchor") != "nw":
+            left = left - iw//2
+            top = top - ih//2
+        for row in range(max(top, 0), min(top + ih, self.height)):
+            # Only the shown pixels of the row that are in the window
+            for start, end in img.shownRuns(row - top):
+                x1, x2 = max(left + start, 0), min(left + end, self.width)
+                if x1 < x2:
+                    src0 = 3*((row - top)*iw + x1 - left)
+                    dest = 3*(row*self.width + x1)
+                    buf[dest:dest + 3*(x2-x1)] = src[src0:src0 + 3*(x2-x1)]
+
+
 class Transform:
 
     """Internal class for 2-D coordinate transformations"""
@@ -425,6 +2243,53 @@ class Transform:
         y = self.ybase - ys*self.yscale
         return x,y
 
+    def screen_many(self, points):
+        # Converts a sequence of (x,y) pairs, or a NumPy array of shape
+        #   (n,2), to screen coordinates, rounding as screen() does.
+        #   Arrays are converted in one vectorized pass and an (n,2)
+        #   integer array is returned; other sequences give a list of
+        #   (xs,ys) tuples.
+        xbase, ybase = self.xbase, self.ybase
+        xscale, yscale = self.xscale, self.yscale
+        if _isArray(points):
+            pts = points.reshape(-1, 2)
+            out = _np.empty(pts.shape, dtype=_np.int64)
+            out[:,0] = (pts[:,0]-xbase)/xscale + 0.5
+            out[:,1] = (ybase-pts[:,1])/yscale + 0.5
+            return out
+        return [(int((x-xbase)/xscale+0.5), int((ybase-y)/yscale+0.5))
+                for x, y in points]
+
+    def screen_flat(self, coords):
+        # Converts a flat sequence x0,y0,x1,y1,... (e.g. an array) to a
+        #   flat list of screen coordinates, rounding as screen() does
+        xbase, ybase = self.xbase, self.ybase
+        xscale, yscale = self.xscale, self.yscale
+        np = _numpy() if len(coords) > 256 else None
+        if np is not None:
+            xy = np.asarray(coords, dtype=np.float64)
+            out = np.empty(len(xy), dtype=np.int64)
+            out[0::2] = (xy[0::2]-xbase)/xscale + 0.5
+            out[1::2] = (ybase-xy[1::2])/yscale + 0.5
+            return out.tolist()
+        out = [0] * len(coords)
+        out[0::2] = [int((x-xbase)/xscale+0.5) for x in coords[0::2]]
+        out[1::2] = [int((ybase-y)/yscale+0.5) for y in coords[1::2]]
+        return out
+
+    def world_many(self, points):
+        # Converts a sequence of (xs,ys) screen pairs, or a NumPy array
+        #   of shape (n,2), to world coordinates (see screen_many)
+        xbase, ybase = self.xbase, self.ybase
+        xscale, yscale = self.xscale, self.yscale
+        if _isArray(points):
+            pts = points.reshape(-1, 2)
+            out = _np.empty(pts.shape, dtype=_np.float64)
+            out[:,0] = pts[:,0]*xscale + xbase
+            out[:,1] = ybase - pts[:,1]*yscale
+            return out
+        return [(x*xscale + xbase, ybase - y*yscale) for x, y in points]
+
 
 # Default values for various item configuration options. Only a subset of
 #   keys may be present in the configuration dictionary for a given item
@@ -436,11 +2301,278 @@ DEFAULT_CONFIG = {"fill":"",
       "justify":"center",
                   "font": ("helvetica", 12, "normal")}
 
+# Distance in pixels within which pick counts a hit on a line or outline
+_PICK_TOLERANCE = 2
+
+# Margin in pixels around the window within which culled objects are
+#   still given canvas items
+_CULL_MARGIN = 16
+
+def _segmentDistance(x, y, x1, y1, x2, y2):
+    # Distance from (x, y) to the segment from (x1, y1) to (x2, y2)
+    dx = x2 - x1
+    dy = y2 - y1
+    length = dx*dx + dy*dy
+    t = 0.0
+    if length:
+        t = max(0.0, min(1.0, ((x-x1)*dx + (y-y1)*dy) / float(length)))
+    ex = x1 + t*dx - x
+    ey = y1 + t*dy - y
+    return (ex*ex + ey*ey) ** 0.5
+
+
+class _GridIndex:
+
+    """Uniform grid over the world coordinate bounding boxes of the
+    objects drawn in a window, used by pick, query and culling. Cells
+    are made square on the screen for the transform in effect when
+    the index is built, and stay valid while the view is panned or
+    moderately zoomed. Pick pads each box by the pick tolerance and
+    half the object's line width, in current pixels."""
+
+    # Objects covering more cells than this are kept in a separate list
+    #   that is always searched
+    MAX_CELLS = 64
+
+    def __init__(self, win, cellPixels=16):
+        self.win = win
+        self.px, self.py = win._pixelSize()
+        self.cw = cellPixels*self.px
+        self.ch = cellPixels*self.py
+        self.cells = {}    # (i, j) -> set of objects
+        self.boxes = {}    # object -> (x1, y1, x2, y2, pad, cells)
+        self.large = set()
+        self.pixelSized = set()   # objects whose boxes depend on the transform
+        self.maxPad = _PICK_TOLERANCE
+
+    def insert(self, obj):
+        box = obj._bounds(self.win)
+        if box is None:
+            return
+        x1, y1, x2, y2 = box
+        width = obj._style.options.get("width")
+        pad = _PICK_TOLERANCE + (float(width)/2 if width else 0)
+        self.maxPad = max(self.maxPad, pad)
+        cells = (int(x1 // self.cw), int(y1 // self.ch),
+                 int(x2 // self.cw), int(y2 // self.ch))
+        i1, j1, i2, j2 = cells
+        if (i2-i1+1) * (j2-j1+1) > self.MAX_CELLS:
+            self.large.add(obj)
+            cells = None
+        else:
+            grid = self.cells
+            for i in range(i1, i2+1):
+                for j in range(j1, j2+1):
+                    members = grid.get((i, j))
+                    if members is None:
+                        grid[i, j] = members = set()
+                    members.add(obj)
+        if obj._pixelBounds:
+            self.pixelSized.add(obj)
+        self.boxes[obj] = (x1, y1, x2, y2, pad, cells)
+
+    def remove(self, obj):
+        entry = self.boxes.pop(obj, None)
+        if entry is None:
+            return
+        self.pixelSized.discard(obj)
+        cells = entry[5]
+        if cells is None:
+            self.large.discard(obj)
+            return
+        i1, j1, i2, j2 = cells
+        grid = self.cells
+        for i in range(i1, i2+1):
+            for j in range(j1, j2+1):
+                members = grid[i, j]
+                members.discard(obj)
+                if not members:
+                    del grid[i, j]
+
+    def update(self, obj):
+        self.remove(obj)
+        self.insert(obj)
+
+    def rescaled(self):
+        # Called when the window transform changes. Returns False if the
+        #   cells no longer suit the new scale, and the index should be
+        #   rebuilt.
+        px, py = self.win._pixelSize()
+        if not (0.25 < px/self.px < 4 and 0.25 < py/self.py < 4):
+            return False
+        for obj in list(self.pixelSized):
+            self.update(obj)
+        return True
+
+    def _candidates(self, x1, y1, x2, y2):
+        i1, j1 = int(x1 // self.cw), int(y1 // self.ch)
+        i2, j2 = int(x2 // self.cw), int(y2 // self.ch)
+        if (i2-i1+1) * (j2-j1+1) > len(self.cells):
+            return self.boxes
+        candidates = set(self.large)
+        grid = self.cells
+        for i in range(i1, i2+1):
+            for j in range(j1, j2+1):
+                members = grid.get((i, j))
+                if members:
+                    candidates.update(members)
+        return candidates
+
+    def at(self, x, y):
+        # Objects whose padded boxes contain (x, y)
+        px, py = self.win._pixelSize()
+        rx, ry = self.maxPad*px, self.maxPad*py
+        boxes = self.boxes
+        found = []
+        for obj in self._candidates(x-rx, y-ry, x+rx, y+ry):
+            x1, y1, x2, y2, pad = boxes[obj][:5]
+            dx, dy = pad*px, pad*py
+            if x1-dx <= x <= x2+dx and y1-dy <= y <= y2+dy:
+                found.append(obj)
+        return found
+
+    def overlapping(self, x1, y1, x2, y2):
+        # Objects whose boxes overlap the box from (x1, y1) to (x2, y2)
+        boxes = self.boxes
+        found = []
+        for obj in self._candidates(x1, y1, x2, y2):
+            bx1, by1, bx2, by2 = boxes[obj][:4]
+            if bx1 <= x2 and x1 <= bx2 and by1 <= y2 and y1 <= by2:
+                found.append(obj)
+        return found
+
+
+class Style(object):
+
+    """An immutable set of item configuration options (fill, outline,
+    width, ...). Styles are interned, so all objects configured the
+    same way share one Style instead of each holding a dictionary.
+    Setters such as setFill switch an object to the Style with the new
+    value. Every drawn item is tagged with its style, which lets
+    GraphWin.restyle change all objects sharing a style at once."""
+
+    __slots__ = ("options", "_tag", "_itemOptions", "__weakref__")
+
+    # Interned styles by sorted (option, type, value) triples; the type
+    #   keeps 1, 1.0 and True apart. Styles whose options are not
+    #   hashable are simply not interned.
+    _interned = weakref.WeakValueDictionary()
+    _count = 0
+
+    def __new__(cls, options=(), **kw):
+        options = dict(options, **kw)
+        key = tuple(sorted((k, type(v), v) for k, v in options.items()))
+        try:
+            style = cls._interned.get(key)
+        except TypeError:
+            key = style = None
+        if style is None:
+            style = object.__new__(cls)
+            style.options = MappingProxyType(options)
+            style._tag = None
+            style._itemOptions = None
+            if key is not None:
+                cls._interned[key] = style
+        return style
+
+    def __repr__(self):
+        return "Style({})".format(", ".join(
+            "{}={!r}".format(k, v) for k, v in sorted(self.options.items())))
+
+    def __getitem__(self, option):
+        return self.options[option]
+
+    @property
+    def tag(self):
+        """The canvas tag carried by items drawn with this style"""
+        if self._tag is None:
+            Style._count += 1
+            self._tag = "style{}".format(Style._count)
+        return self._tag
+
+    def replace(self, **changes):
+        """Returns the Style with the given options changed"""
+        for option in changes:
+            if option not in self.options:
+                raise GraphicsError(UNSUPPORTED_METHOD)
+        return Style(self.options, **changes)
+
+    def getItemOptions(self):
+        # Options for creating or configuring a canvas item, including
+        #   the style tag. Shared, so callers must not modify it.
+        if self._itemOptions is None:
+            options = dict(self.options)
+            if options:
+                options["tags"] = self.tag
+            self._itemOptions = options
+        return self._itemOptions
+
+class _Config(MutableMapping):
+
+    """The configuration options of a graphics object, as returned by
+    its config attribute. Setting an option switches the object to the
+    Style with the new value (and updates its canvas item)."""
+
+    __slots__ = ("_obj",)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, option):
+        return self._obj._style.options[option]
+
+    def __iter__(self):
+        return iter(self._obj._style.options)
+
+    def __len__(self):
+        return len(self._obj._style.options)
+
+    def __setitem__(self, option, value):
+        obj = self._obj
+        if option in obj._style.options:
+            obj._reconfig(option, value)
+        else:
+            obj._style = Style(obj._style.options, **{option: value})
+
+    def __delitem__(self, option):
+        options = dict(self._obj._style.options)
+        del options[option]
+        self._obj._style = Style(options)
+
+    def __repr__(self):
+        return repr(dict(self._obj._style.options))
+
+    def copy(self):
+        return dict(self._obj._style.options)
+
+# Default styles, keyed by tuple of option names
+_defaultStyles = {}
+
+def _defaultStyle(options):
+    key = tuple(options)
+    style = _defaultStyles.get(key)
+    if style is None:
+        style = _defaultStyles[key] = Style((option, DEFAULT_CONFIG[option])
+                                            for option in options)
+    return style
+
 class GraphicsObject:
 
     """Generic base class for all of the drawable objects"""
     # A subclass of GraphicsObject should override _draw and
     #   and _move methods.
+
+    # Instances keep the library's state in slots to stay small. The
+    #   __dict__ slot keeps programs free to set their own attributes
+    #   (ball.dx = 3); Python only allocates it when one is set.
+    __slots__ = ("canvas", "id", "_style", "__dict__")
+
+    # True for classes whose world bounds depend on the window transform
+    _pixelBounds = False
+
+    # Type of canvas item drawn, for classes whose items can be reused
+    #   through coords and itemconfig while the window pools items
+    _itemType = None
     
     def __init__(self, options):
         # options is a list of strings indicating which options are
@@ -452,11 +2584,33 @@ class GraphicsObject:
         self.canvas = None
         self.id = None
 
-        # config is the dictionary of configuration options for the widget.
-        config = {}
-        for option in options:
-            config[option] = DEFAULT_CONFIG[option]
-        self.config = config
+        # _style holds the configuration options for the widget. Objects
+        #    start out sharing the default Style for their options.
+        self._style = _defaultStyle(options)
+
+    @property
+    def config(self):
+        """Dictionary of the object's configuration options"""
+        return _Config(self)
+
+    @config.setter
+    def config(self, options):
+        self._style = Style(options)
+
+    def getItemStyle(self):
+        """Returns the Style holding the object's configuration"""
+        return self._style
+
+    def setItemStyle(self, style):
+        """Configure the object with style, which must have the same
+        options as the object's current style"""
+        if set(style.options) != set(self._style.options):
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        self._style = style
+        canvas = self.canvas
+        if canvas and not canvas.isClosed() and self.id is not None:
+            canvas._configItem(self.id,
+                self._itemOptions(canvas._groupTags.get(self, ())))
         
     def setFill(self, color):
         """Set interior color to color"""
@@ -479,12 +2633,22 @@ class GraphicsObject:
 
         if self.canvas and not self.canvas.isClosed(): raise GraphicsError(OBJ_ALREADY_DRAWN)
         if graphwin.isClosed(): raise GraphicsError("Can't draw to closed window")
+        self._drawTagged(graphwin, ())
+        graphwin._autoflush()
+        return self
+
+    def _drawTagged(self, graphwin, groupTags):
+        # Draw the object's canvas item, tagged with the tags of the
+        #   groups it is drawn in. A window that culls creates no item
+        #   for an object out of view.
         self.canvas = graphwin
-        self.id = self._draw(graphwin, self.config)
+        if groupTags:
+            graphwin._groupTags[self] = groupTags
+        if graphwin._culling and not graphwin._inView(self):
+            self.id = None
+        else:
+            self.id = graphwin._createItem(self, groupTags)
         graphwin.addItem(self)
-        if graphwin.autoflush:
-            _root.update()
-        return self
 
             
     def undraw(self):
@@ -494,10 +2658,10 @@ class GraphicsObject:
         
         if not self.canvas: return
         if not self.canvas.isClosed():
-            self.canvas.delete(self.id)
+            if self.id is not None:
+                self.canvas._releaseItem(self)
             self.canvas.delItem(self)
-            if self.canvas.autoflush:
-                _root.update()
+            self.canvas._autoflush()
         self.canvas = None
         self.id = None
 
@@ -510,29 +2674,62 @@ class GraphicsObject:
         self._move(dx,dy)
         canvas = self.canvas
         if canvas and not canvas.isClosed():
-            trans = canvas.trans
-            if trans:
-                x = dx/ trans.xscale 
-                y = -dy / trans.yscale
-            else:
-                x = dx
-                y = dy
-            self.canvas.move(self.id, x, y)
-            if canvas.autoflush:
-                _root.update()
+            if self.id is not None:
+                trans = canvas.trans
+                if trans:
+                    x = dx/ trans.xscale 
+                    y = -dy / trans.yscale
+                else:
+                    x = dx
+                    y = dy
+                canvas._moveItem(self.id, x, y)
+            if canvas._index is not None:
+                objs = self._itemObjects()
+                for obj in objs:
+                    canvas._index.update(obj)
+                if canvas._culling:
+                    canvas._cull(objs)
+
+    def lift(self):
+        """Raise the object above all other objects in its window"""
+        canvas = self.canvas
+        if canvas and not canvas.isClosed():
+            canvas._stackObject(self, True)
+
+    def lower(self):
+        """Lower the object below all other objects in its window"""
+        canvas = self.canvas
+        if canvas and not canvas.isClosed():
+            canvas._stackObject(self, False)
            
     def _reconfig(self, option, setting):
         # Internal method for changing configuration of the object
-        # Raises an error if the option does not exist in the config
-        #    dictionary for this object
-        if option not in self.config:
-            raise GraphicsError(UNSUPPORTED_METHOD)
-        options = self.config
-        options[option] = setting
-        if self.canvas and not self.canvas.isClosed():
-            self.canvas.itemconfig(self.id, options)
-            if self.canvas.autoflush:
-                _root.update()
+        # Raises an error if the option does not exist in the style
+        #    of this object. Only the changed option (and the new style
+        #    tag) is sent to the canvas.
+        style = self._style
+        self._style = self._style.replace(**{option: setting})
+        canvas = self.canvas
+        if canvas and not canvas.isClosed() and self._style is not style:
+            if self.id is not None:
+                tags = self._itemOptions(canvas._groupTags.get(self, ()))["tags"]
+                canvas._configItem(self.id, {option: setting, "tags": tags})
+            if canvas._index is not None and option in ("text", "font", "width"):
+                canvas._index.update(self)
+                if canvas._culling:
+                    canvas._cull((self,))
+
+    def _itemOptions(self, groupTags=()):
+        # Options used to create or configure the object's canvas item.
+        #   groupTags are the tags of the groups the object is drawn in.
+        options = self._style.getItemOptions()
+        if groupTags:
+            options = dict(options)
+            if "tags" in options:
+                options["tags"] = (options["tags"],) + groupTags
+            else:
+                options["tags"] = groupTags
+        return options
 
 
     def _draw(self, canvas, options):
@@ -541,24 +2738,62 @@ class GraphicsObject:
         pass # must override in subclass
 
 
+    def _itemObjects(self):
+        # The drawn objects whose canvas items make up this object
+        return (self,)
+
+    def _bounds(self, canvas):
+        """returns the box (x1, y1, x2, y2) around the figure in world
+        coordinates, or None if it can't be picked"""
+        coords = self._coords(canvas)
+        if not coords:
+            return None
+        xs, ys = coords[0::2], coords[1::2]
+        x1, y1 = canvas.toWorld(min(xs), min(ys))
+        x2, y2 = canvas.toWorld(max(xs), max(ys))
+        return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+    def _contains(self, canvas, x, y, tol):
+        """returns True if screen point (x, y) hits the figure, given
+        that it is within tol pixels of its bounding box"""
+        return True
+
+    def _coords(self, canvas):
+        """returns the list of screen coordinates of the figure on
+        canvas, or None if it can only be placed by drawing it"""
+        return None
+
+
     def _move(self, dx, dy):
         """updates internal state of object to move it dx,dy units"""
         pass # must override in subclass
 
          
 class Point(GraphicsObject):
+
+    __slots__ = ("x", "y")
+    _itemType = "rectangle"
+
     def __init__(self, x, y):
         GraphicsObject.__init__(self, ["outline", "fill"])
-        self.setFill = self.setOutline
         self.x = float(x)
         self.y = float(y)
 
+    # A point is drawn as its outline, so fill sets the outline color
+    setFill = GraphicsObject.setOutline
+
     def __repr__(self):
         return "Point({}, {})".format(self.x, self.y)
         
     def _draw(self, canvas, options):
+        return canvas.create_rectangle(self._coords(canvas),options)
+
+    def _coords(self, canvas):
         x,y = canvas.toScreen(self.x,self.y)
-        return canvas.create_rectangle(x,y,x+1,y+1,options)
+        return [x,y,x+1,y+1]
+
+    def _bounds(self, canvas):
+        return self.x, self.y, self.x, self.y
         
     def _move(self, dx, dy):
         self.x = self.x + dx
@@ -575,6 +2810,8 @@ class Point(GraphicsObject):
 class _BBox(GraphicsObject):
     # Internal base class for objects represented by bounding box
     # (opposite corners) Line segment is a degenerate case.
+
+    __slots__ = ("p1", "p2")
     
     def __init__(self, p1, p2, options=["outline","width","fill"]):
         GraphicsObject.__init__(self, options)
@@ -586,6 +2823,18 @@ class _BBox(GraphicsObject):
         self.p1.y = self.p1.y + dy
         self.p2.x = self.p2.x + dx
         self.p2.y = self.p2.y  + dy
+
+    def _coords(self, canvas):
+        p1 = self.p1
+        p2 = self.p2
+        x1,y1 = canvas.toScreen(p1.x,p1.y)
+        x2,y2 = canvas.toScreen(p2.x,p2.y)
+        return [x1,y1,x2,y2]
+
+    def _bounds(self, canvas):
+        p1 = self.p1
+        p2 = self.p2
+        return min(p1.x, p2.x), min(p1.y, p2.y), max(p1.x, p2.x), max(p1.y, p2.y)
                 
     def getP1(self): return self.p1.clone()
 
@@ -598,6 +2847,9 @@ class _BBox(GraphicsObject):
 
     
 class Rectangle(_BBox):
+
+    __slots__ = ()
+    _itemType = "rectangle"
     
     def __init__(self, p1, p2):
         _BBox.__init__(self, p1, p2)
@@ -606,11 +2858,7 @@ class Rectangle(_BBox):
         return "Rectangle({}, {})".format(str(self.p1), str(self.p2))
     
     def _draw(self, canvas, options):
-        p1 = self.p1
-        p2 = self.p2
-        x1,y1 = canvas.toScreen(p1.x,p1.y)
-        x2,y2 = canvas.toScreen(p2.x,p2.y)
-        return canvas.create_rectangle(x1,y1,x2,y2,options)
+        return canvas.create_rectangle(self._coords(canvas),options)
         
     def clone(self):
         other = Rectangle(self.p1, self.p2)
@@ -619,6 +2867,9 @@ class Rectangle(_BBox):
 
 
 class Oval(_BBox):
+
+    __slots__ = ()
+    _itemType = "oval"
     
     def __init__(self, p1, p2):
         _BBox.__init__(self, p1, p2)
@@ -633,13 +2884,20 @@ class Oval(_BBox):
         return other
    
     def _draw(self, canvas, options):
-        p1 = self.p1
-        p2 = self.p2
-        x1,y1 = canvas.toScreen(p1.x,p1.y)
-        x2,y2 = canvas.toScreen(p2.x,p2.y)
-        return canvas.create_oval(x1,y1,x2,y2,options)
+        return canvas.create_oval(self._coords(canvas),options)
+
+    def _contains(self, canvas, x, y, tol):
+        x1,y1,x2,y2 = self._coords(canvas)
+        tol = tol + float(self._style["width"])/2
+        rx = abs(x2-x1)/2.0 + tol
+        ry = abs(y2-y1)/2.0 + tol
+        dx = (x - (x1+x2)/2.0) / rx
+        dy = (y - (y1+y2)/2.0) / ry
+        return dx*dx + dy*dy <= 1
     
 class Circle(Oval):
+
+    __slots__ = ("radius",)
     
     def __init__(self, center, radius):
         p1 = Point(center.x-radius, center.y-radius)
@@ -660,11 +2918,16 @@ class Circle(Oval):
 
                   
 class Line(_BBox):
+
+    __slots__ = ()
+    _itemType = "line"
     
     def __init__(self, p1, p2):
         _BBox.__init__(self, p1, p2, ["arrow","fill","width"])
         self.setFill(DEFAULT_CONFIG['outline'])
-        self.setOutline = self.setFill
+
+    # A line is drawn with its fill color, so outline sets that too
+    setOutline = GraphicsObject.setFill
 
     def __repr__(self):
         return "Line({}, {})".format(str(self.p1), str(self.p2))
@@ -675,11 +2938,11 @@ class Line(_BBox):
         return other
   
     def _draw(self, canvas, options):
-        p1 = self.p1
-        p2 = self.p2
-        x1,y1 = canvas.toScreen(p1.x,p1.y)
-        x2,y2 = canvas.toScreen(p2.x,p2.y)
-        return canvas.create_line(x1,y1,x2,y2,options)
+        return canvas.create_line(self._coords(canvas),options)
+
+    def _contains(self, canvas, x, y, tol):
+        tol = tol + float(self._style["width"])/2
+        return _segmentDistance(x, y, *self._coords(canvas)) <= tol
         
     def setArrow(self, option):
         if not option in ["first","last","both","none"]:
@@ -688,60 +2951,136 @@ class Line(_BBox):
         
 
 class Polygon(GraphicsObject):
+
+    # The vertices are kept as a flat array of doubles x0,y0,x1,y1,...
+    __slots__ = ("_xy",)
+    _itemType = "polygon"
     
     def __init__(self, *points):
         # if points passed as a list, extract it
         if len(points) == 1 and type(points[0]) == type([]):
             points = points[0]
-        self.points = list(map(Point.clone, points))
+        xy = array("d")
+        for p in points:
+            xy.append(p.x)
+            xy.append(p.y)
+        self._xy = xy
         GraphicsObject.__init__(self, ["outline", "width", "fill"])
 
+    @classmethod
+    def fromCoords(cls, coords):
+        """Returns a Polygon with vertices given as a flat sequence
+        x0,y0,x1,y1,... (a list, array or NumPy array), without making
+        a Point for each vertex"""
+        other = cls()
+        if _isArray(coords):
+            coords = coords.astype("float64").ravel()
+        other._xy = array("d", coords)
+        if len(other._xy) % 2:
+            raise GraphicsError(BAD_OPTION)
+        return other
+
     def __repr__(self):
         return "Polygon"+str(tuple(p for p in self.points))
         
     def clone(self):
-        other = Polygon(*self.points)
+        other = Polygon.fromCoords(self._xy)
         other.config = self.config.copy()
         return other
 
+    @property
+    def points(self):
+        # Read-only: a new list of Points each time
+        return self.getPoints()
+
     def getPoints(self):
-        return list(map(Point.clone, self.points))
+        xy = self._xy
+        return [Point(xy[i], xy[i+1]) for i in range(0, len(xy), 2)]
+
+    def getCoords(self):
+        """Returns a read-only view of the vertex coordinates as a flat
+        sequence x0,y0,x1,y1,... of floats, without copying them"""
+        return memoryview(self._xy).toreadonly()
 
     def _move(self, dx, dy):
-        for p in self.points:
-            p.move(dx,dy)
+        xy = self._xy
+        np = _numpy() if len(xy) > 256 else None
+        if np is not None:
+            coords = np.frombuffer(xy, dtype=np.float64)
+            coords[0::2] += dx
+            coords[1::2] += dy
+        else:
+            xy[0::2] = array("d", [x + dx for x in xy[0::2]])
+            xy[1::2] = array("d", [y + dy for y in xy[1::2]])
    
     def _draw(self, canvas, options):
-        args = [canvas]
-        for p in self.points:
-            x,y = canvas.toScreen(p.x,p.y)
-            args.append(x)
-            args.append(y)
-        args.append(options)
-        return GraphWin.create_polygon(*args) 
+        return canvas.create_polygon(self._coords(canvas), options)
+
+    def _coords(self, canvas):
+        trans = canvas.trans
+        if trans:
+            return trans.screen_flat(self._xy)
+        return self._xy.tolist()
+
+    def _bounds(self, canvas):
+        xy = self._xy
+        if not xy:
+            return None
+        xs, ys = xy[0::2], xy[1::2]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def _contains(self, canvas, x, y, tol):
+        # Inside by the even-odd rule, or near an edge
+        coords = self._coords(canvas)
+        tol = tol + float(self._style["width"])/2
+        inside = False
+        x1, y1 = coords[-2], coords[-1]
+        for i in range(0, len(coords), 2):
+            x2, y2 = coords[i], coords[i+1]
+            if (y1 > y) != (y2 > y) and x < x1 + (y-y1)*(x2-x1)/(y2-y1):
+                inside = not inside
+            if _segmentDistance(x, y, x1, y1, x2, y2) <= tol:
+                return True
+            x1, y1 = x2, y2
+        return inside
 
 class Text(GraphicsObject):
+
+    __slots__ = ("anchor",)
+    _pixelBounds = True
+    _itemType = "text"
     
     def __init__(self, p, text):
         GraphicsObject.__init__(self, ["justify","fill","text","font"])
         self.setText(text)
         self.anchor = p.clone()
         self.setFill(DEFAULT_CONFIG['outline'])
-        self.setOutline = self.setFill
+
+    # Text is drawn with its fill color, so outline sets that too
+    setOutline = GraphicsObject.setFill
 
     def __repr__(self):
         return "Text({}, '{}')".format(self.anchor, self.getText())
     
     def _draw(self, canvas, options):
+        return canvas.create_text(self._coords(canvas),options)
+
+    def _coords(self, canvas):
         p = self.anchor
-        x,y = canvas.toScreen(p.x,p.y)
-        return canvas.create_text(x,y,options)
+        return list(canvas.toScreen(p.x,p.y))
+
+    def _bounds(self, canvas):
+        # Estimated from the font size, without asking Tk for metrics
+        size = self._style["font"][1]
+        lines = str(self._style["text"]).split("\n")
+        return canvas._pixelBox(self.anchor, 0.6*size*max(map(len, lines)),
+                                1.5*size*len(lines))
         
     def _move(self, dx, dy):
         self.anchor.move(dx,dy)
         
     def clone(self):
-        other = Text(self.anchor, self.config['text'])
+        other = Text(self.anchor, self._style['text'])
         other.config = self.config.copy()
         return other
 
@@ -749,28 +3088,28 @@ class Text(GraphicsObject):
         self._reconfig("text", text)
         
     def getText(self):
-        return self.config["text"]
+        return self._style["text"]
             
     def getAnchor(self):
         return self.anchor.clone()
 
     def setFace(self, face):
         if face in ['helvetica','arial','courier','times roman']:
-            f,s,b = self.config['font']
+            f,s,b = self._style['font']
             self._reconfig("font",(face,s,b))
         else:
             raise GraphicsError(BAD_OPTION)
 
     def setSize(self, size):
         if 5 <= size <= 36:
-            f,s,b = self.config['font']
+            f,s,b = self._style['font']
             self._reconfig("font", (f,size,b))
         else:
             raise GraphicsError(BAD_OPTION)
 
     def setStyle(self, style):
         if style in ['bold','normal','italic', 'bold italic']:
-            f,s,b = self.config['font']
+            f,s,b = self._style['font']
             self._reconfig("font", (f,s,style))
         else:
             raise GraphicsError(BAD_OPTION)
@@ -781,12 +3120,15 @@ class Text(GraphicsObject):
 
 class Entry(GraphicsObject):
 
+    __slots__ = ("anchor", "width", "text", "fill", "color", "font", "entry")
+    _pixelBounds = True
+
     def __init__(self, p, width):
         GraphicsObject.__init__(self, [])
         self.anchor = p.clone()
         #print self.anchor
         self.width = width
-        self.text = tk.StringVar(_root)
+        self.text = tk.StringVar(_getRoot())
         self.text.set("")
         self.fill = "gray"
         self.color = "black"
@@ -809,7 +3151,16 @@ class Entry(GraphicsObject):
         self.entry.pack()
         #self.setFill(self.fill)
         self.entry.focus_set()
-        return canvas.create_window(x,y,window=frm)
+        return canvas.create_window(x,y,options,window=frm)
+
+    def _coords(self, canvas):
+        p = self.anchor
+        return list(canvas.toScreen(p.x,p.y))
+
+    def _bounds(self, canvas):
+        # Estimated from the font size, including the entry's border
+        size = self.font[1]
+        return canvas._pixelBox(self.anchor, 0.6*size*self.width + 8, 1.5*size + 8)
 
     def getText(self):
         return self.text.get()
@@ -870,21 +3221,528 @@ class Entry(GraphicsObject):
             self.entry.config(fg=color)
 
 
+class GraphicsGroup(GraphicsObject):
+
+    """A group of graphics objects that is drawn, moved, restyled and
+    undrawn as a unit. The items of the group share a canvas tag, so
+    each of these operations is a constant number of canvas calls no
+    matter how many objects the group holds. Groups may contain other
+    groups."""
+
+    __slots__ = ("tag", "_objects")
+
+    _count = 0
+
+    def __init__(self, *objects):
+        GraphicsObject.__init__(self, [])
+        GraphicsGroup._count += 1
+        self.tag = "group{}".format(GraphicsGroup._count)
+        self._objects = []
+        for obj in objects:
+            self.add(obj)
+
+    def __repr__(self):
+        return "GraphicsGroup({})".format(", ".join(map(repr, self._objects)))
+
+    def __iter__(self):
+        return iter(self._objects)
+
+    def __len__(self):
+        return len(self._objects)
+
+    def getObjects(self):
+        """Returns a list of the objects in the group"""
+        return list(self._objects)
+
+    def add(self, obj):
+        """Add obj to the group. If the group is drawn, obj is drawn
+        with it and must not be drawn already."""
+        if obj is self or (isinstance(obj, GraphicsGroup) and self in obj._members()):
+            raise GraphicsError("A group can't contain itself")
+        canvas = self.canvas
+        if canvas and not canvas.isClosed():
+            if obj.canvas and not obj.canvas.isClosed():
+                raise GraphicsError(OBJ_ALREADY_DRAWN)
+            obj._drawTagged(canvas, self._tags())
+            canvas._autoflush()
+        self._objects.append(obj)
+        return self
+
+    def remove(self, obj):
+        """Remove obj from the group, undrawing it if the group is drawn"""
+        self._objects.remove(obj)
+        if self.canvas:
+            obj.undraw()
+
+    def clone(self):
+        return GraphicsGroup(*[obj.clone() for obj in self._objects])
+
+    def _members(self):
+        # All objects in the group and its subgroups, subgroups included
+        for obj in self._objects:
+            yield obj
+            if isinstance(obj, GraphicsGroup):
+                for member in obj._members():
+                    yield member
+
+    def _leaves(self):
+        # The drawable objects in the group and its subgroups
+        for obj in self._members():
+            if not isinstance(obj, GraphicsGroup):
+                yield obj
+
+    def _tags(self):
+        # Tags given to the items of the group's objects
+        canvas = self.canvas
+        return canvas._groupTags[self] if canvas else ()
+
+    def _inGroup(self, obj):
+        # True if obj is drawn as part of this group
+        canvas = obj.canvas
+        return (canvas is not None and canvas is self.canvas and
+                self.tag in canvas._groupTags.get(obj, ()))
+
+    def draw(self, graphwin):
+        """Draw all the objects in the group in graphwin"""
+        if self.canvas and not self.canvas.isClosed(): raise GraphicsError(OBJ_ALREADY_DRAWN)
+        if graphwin.isClosed(): raise GraphicsError("Can't draw to closed window")
+        for obj in self._members():
+            if obj.canvas and not obj.canvas.isClosed():
+                raise GraphicsError(OBJ_ALREADY_DRAWN)
+        self._drawTagged(graphwin, ())
+        graphwin._autoflush()
+        return self
+
+    def _drawTagged(self, graphwin, groupTags):
+        # The group's "item" is its tag, which canvas operations accept
+        #   in place of an item id
+        tags = groupTags + (self.tag,)
+        self.canvas = graphwin
+        self.id = self.tag
+        graphwin._groupTags[self] = tags
+        for obj in self._objects:
+            obj._drawTagged(graphwin, tags)
+
+    def undraw(self):
+        """Undraw all the objects in the group with one canvas call"""
+        canvas = self.canvas
+        if not canvas: return
+        if not canvas.isClosed():
+            # Deleted now rather than queued with a batch's deletes,
+            #   which would also take items drawn later with the tag
+            canvas._dropPending(self.tag)
+            canvas.delete(self.tag)
+            for obj in self._members():
+                if isinstance(obj, GraphicsGroup):
+                    if obj.canvas is canvas:
+                        canvas._groupTags.pop(obj, None)
+                        obj.canvas = obj.id = None
+                elif self._inGroup(obj):
+                    canvas._dropPending(obj.id)
+                    canvas.delItem(obj)
+                    obj.canvas = obj.id = None
+            canvas._groupTags.pop(self, None)
+            canvas._autoflush()
+        else:
+            for obj in self._members():
+                if obj.canvas is canvas:
+                    obj.canvas = obj.id = None
+        self.canvas = None
+        self.id = None
+
+    def _move(self, dx, dy):
+        for obj in self._objects:
+            obj._move(dx, dy)
+
+    def _coords(self, canvas):
+        return None
+
+    def _itemObjects(self):
+        return [obj for obj in self._leaves() if self._inGroup(obj)]
+
+    def _reconfig(self, option, setting):
+        # Changes option on each object in the group that has it. The
+        #   items are configured and retagged through the group tag,
+        #   with one set of calls per distinct style involved (usually
+        #   just one).
+        canvas = self.canvas
+        drawn = canvas and not canvas.isClosed()
+        restyled = {}
+        for obj in self._leaves():
+            style = obj._style
+            if option not in style.options:
+                continue
+            if drawn and obj.canvas and not self._inGroup(obj):
+                continue
+            new = restyled.get(style)
+            if new is None:
+                new = restyled[style] = style.replace(**{option: setting})
+            obj._style = new
+        if not restyled:
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        if drawn:
+            # Queued per-item changes must not override this one
+            canvas._flushPending()
+            for style, new in restyled.items():
+                if new is style: continue
+                items = "{}&&{}".format(self.tag, style.tag)
+                canvas.itemconfig(items, {option: setting})
+                canvas.addtag_withtag(new.tag, items)
+                canvas.dtag(items, style.tag)
+            if canvas._index is not None and option == "width":
+                for obj in self._itemObjects():
+                    canvas._index.update(obj)
+            canvas._autoflush()
+
+    def setItemStyle(self, style):
+        raise GraphicsError(UNSUPPORTED_METHOD)
+
+
+def _pixelBuffer(pixels, width=None, height=None):
+    # Returns pixels (a NumPy array of shape (h,w,3) or (h,w), or a
+    #   bytes-like object of rgb or gray rows with the given width and
+    #   height) as (data, width, height, channels)
+    if _isArray(pixels):
+        if pixels.ndim == 3 and pixels.shape[2] == 3:
+            channels = 3
+        elif pixels.ndim == 2:
+            channels = 1
+        else:
+            raise GraphicsError(BAD_OPTION)
+        height, width = pixels.shape[:2]
+        return (_np.ascontiguousarray(pixels, dtype=_np.uint8).tobytes(),
+                width, height, channels)
+    data = memoryview(pixels).cast("B")
+    if not width or not height:
+        raise GraphicsError(BAD_OPTION)
+    if len(data) == 3*width*height:
+        channels = 3
+    elif len(data) == width*height:
+        channels = 1
+    else:
+        raise GraphicsError(BAD_OPTION)
+    return data, width, height, channels
+
+def _pnmHeader(width, height, channels):
+    magic = b"P6" if channels == 3 else b"P5"
+    return magic + ("\n%d %d\n255\n" % (width, height)).encode("ascii")
+
+def _encodePNM(data, width, height, channels):
+    # Returns binary PPM (rgb) or PGM (gray) file contents for pixel rows
+    return _pnmHeader(width, height, channels) + bytes(data)
+
+def _writePNM(f, data, width, height, channels):
+    f.write(_pnmHeader(width, height, channels))
+    f.write(data)
+
+def _pngChunk(f, kind, body):
+    f.write(struct.pack(">I", len(body)))
+    f.write(kind)
+    f.write(body)
+    f.write(struct.pack(">I", zlib.crc32(kind + body) & 0xffffffff))
+
+def _writePNG(f, data, width, height, channels, level=6):
+    # Streams rows through zlib, so only one compressed block is held
+    #   in memory at a time
+    f.write(b"\x89PNG\r\n\x1a\n")
+    colorType = 2 if channels == 3 else 0
+    _pngChunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8,
+                                      colorType, 0, 0, 0))
+    compressor = zlib.compressobj(level)
+    stride = width*channels
+    for start in range(0, stride*height, stride):
+        block = compressor.compress(b"\x00" + bytes(data[start:start+stride]))
+        if block:
+            _pngChunk(f, b"IDAT", block)
+    _pngChunk(f, b"IDAT", compressor.flush())
+    _pngChunk(f, b"IEND", b"")
+
+def _toChannels(data, channels, wanted):
+    # Converts packed pixel data between rgb and gray levels
+    if channels == wanted:
+        return data
+    np = _numpy()
+    if np is not None:
+        pixels = np.frombuffer(data, dtype=np.uint8)
+        if wanted == 3:
+            return np.repeat(pixels, 3).tobytes()
+        rgb = pixels.reshape(-1, 3).astype(np.uint32)
+        return ((rgb[:,0]*299 + rgb[:,1]*587 + rgb[:,2]*114) // 1000).astype(np.uint8).tobytes()
+    data = bytes(data)
+    if wanted == 3:
+        return bytes(v for v in data for i in range(3))
+    return bytes((data[i]*299 + data[i+1]*587 + data[i+2]*114) // 1000
+                 for i in range(0, len(data), 3))
+
+_ENCODERS = {"ppm": (_writePNM, 3), "pgm": (_writePNM, 1), "png": (_writePNG, None)}
+
+def savePixels(filename, pixels, width=None, height=None):
+    """Writes pixels (a NumPy array, or a bytes-like object of rgb or
+    gray rows of the given width and height) to filename without
+    going through Tk. The format (ppm, pgm or png) is determined from
+    the filename extension."""
+    filename = os.fspath(filename)
+    ext = filename.split(".")[-1].lower()
+    if ext not in _ENCODERS:
+        raise GraphicsError("Unsupported image format: " + ext)
+    data, width, height, channels = _pixelBuffer(pixels, width, height)
+    encoder, wanted = _ENCODERS[ext]
+    if wanted:
+        data, channels = _toChannels(data, channels, wanted), wanted
+    with open(filename, "wb") as f:
+        encoder(f, data, width, height, channels)
+
+def _decodePNM(data):
+    # Returns (pixels, width, height, channels) from binary PPM/PGM data
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while data[pos:pos+1].isspace():
+            pos = pos + 1
+        if data[pos:pos+1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        start = pos
+        while pos < len(data) and not data[pos:pos+1].isspace():
+            pos = pos + 1
+        fields.append(data[start:pos])
+    magic, width, height, maxval = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+    if magic not in (b"P5", b"P6") or maxval != 255:
+        raise GraphicsError("Unsupported PPM/PGM data")
+    channels = 3 if magic == b"P6" else 1
+    pos = pos + 1
+    return data[pos:pos + width*height*channels], width, height, channels
+
+def _decodePNG(data):
+    # Returns (pixels, width, height, channels) for 8-bit, non-interlaced
+    #   gray or rgb PNG data; any alpha channel is dropped
+    pos = 8
+    idat = []
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos+8])
+        body = data[pos+8:pos+8+length]
+        if kind == b"IHDR":
+            width, height, depth, colorType, comp, filt, interlace = \
+                   struct.unpack(">IIBBBBB", body)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+        pos = pos + 12 + length
+    samples = {0: 1, 2: 3, 4: 2, 6: 4}.get(colorType)
+    if depth != 8 or interlace or samples is None:
+        raise GraphicsError("Unsupported PNG image")
+    raw = zlib.decompress(b"".join(idat))
+    stride = width*samples
+    out = bytearray(stride*height)
+    prev = bytearray(stride)
+    for y in range(height):
+        start = y*(stride+1)
+        ftype = raw[start]
+        row = bytearray(raw[start+1:start+1+stride])
+        if ftype == 1:
+            for i in range(samples, stride):
+                row[i] = (row[i] + row[i-samples]) & 255
+        elif ftype == 2:
+            for i in range(stride):
+                row[i] = (row[i] + prev[i]) & 255
+        elif ftype == 3:
+            for i in range(stride):
+                left = row[i-samples] if i >= samples else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 255
+        elif ftype == 4:
+            for i in range(stride):
+                a = row[i-samples] if i >= samples else 0
+                b = prev[i]
+                c = prev[i-samples] if i >= samples else 0
+                p = a + b - c
+                pa, pb, pc = abs(p-a), abs(p-b), abs(p-c)
+                if pa <= pb and pa <= pc: pred = a
+                elif pb <= pc: pred = b
+                else: pred = c
+                row[i] = (row[i] + pred) & 255
+        out[y*stride:(y+1)*stride] = row
+        prev = row
+    if samples in (2, 4):  # drop alpha
+        keep = samples - 1
+        out = bytearray(b for i in range(0, len(out), samples)
+                        for b in out[i:i+keep])
+        samples = keep
+    return out, width, height, samples
+
+def _readPixelFile(filename):
+    # Returns (pixels, width, height, channels) from a PPM, PGM or PNG file
+    with open(filename, "rb") as f:
+        data = f.read()
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return _decodePNG(data)
+    if data[:2] in (b"P5", b"P6"):
+        return _decodePNM(data)
+    raise GraphicsError("Unsupported image file: " + filename)
+
+def _tkPhotoRead(img, x, y, width, height):
+    # Returns packed RGB bytes for a region of a Tk photo with a single
+    #   Tk call
+    data = img.tk.call(img.name, "data", "-from", x, y, x+width, y+height)
+    if not isinstance(data, str):
+        # list result: rows of colors, as strings or tuples
+        parts = []
+        for row in data:
+            if isinstance(row, tuple):
+                parts.extend(map(str, row))
+            else:
+                parts.append(str(row))
+        data = " ".join(parts)
+    return bytes.fromhex(data.replace("#", "").replace("{", "").replace("}", ""))
+
+def _tkPhotoWrite(img, data, x, y, width, height):
+    # Puts packed RGB bytes into a region of a Tk photo with a single
+    #   Tk call
+    hexdata = bytes(data).hex()
+    step = 6*width
+    rows = []
+    for start in range(0, step*height, step):
+        row = hexdata[start:start+step]
+        rows.append("{#" + " #".join([row[i:i+6] for i in range(0, step, 6)]) + "}")
+    img.put(" ".join(rows), to=(x, y))
+
+
+def _loadPhoto(filename):
+    # Returns the photo for an image file. Tk reads more formats than
+    #   _readPixelFile and keeps transparency, so it is used unless the
+    #   raster backend is selected or there is no display.
+    if _backend() != "raster":
+        try:
+            return tk.PhotoImage(file=filename, master=_getRoot())
+        except tk.TclError:
+            if _root is not None:
+                raise
+    return _RasterPhoto(*_readPixelFile(filename))
+
+
+class _RasterPhoto:
+
+    """Pixel store standing in for tk.PhotoImage until an Image is
+    drawn in a Tk window, and always with the raster backend; rgb rows
+    are kept in a bytearray. Like a blank Tk photo, a blank one is
+    transparent where no pixel has been put."""
+
+    def __init__(self, data, width, height, channels=3, blank=False):
+        self.load(data, width, height, channels)
+        if blank:
+            self._shown = bytearray(width*height)  # 1 for each pixel put
+
+    def load(self, data, width, height, channels=3):
+        self._width = width
+        self._height = height
+        self._data = bytearray(_toChannels(data, channels, 3))
+        self._shown = None
+
+    def shownRuns(self, y):
+        # Yields (start, end) for the runs of shown pixels in row y
+        if self._shown is None:
+            yield 0, self._width
+            return
+        row = self._shown[y*self._width:(y+1)*self._width]
+        start = row.find(1)
+        while start != -1:
+            end = row.find(0, start)
+            if end == -1:
+                end = self._width
+            yield start, end
+            start = row.find(1, end)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def get(self, x, y):
+        start = 3*(y*self._width + x)
+        return tuple(self._data[start:start+3])
+
+    def put(self, color, to):
+        x, y = to[:2]
+        start = 3*(y*self._width + x)
+        self._data[start:start+3] = bytearray(_rgb(color.strip("{}")) or (0,0,0))
+        if self._shown is not None:
+            self._shown[y*self._width + x] = 1
+
+    def getRGB(self, x, y, width, height):
+        if x == 0 and width == self._width:
+            return bytes(self._data[3*y*width:3*(y+height)*width])
+        rows = []
+        for row in range(y, y + height):
+            start = 3*(row*self._width + x)
+            rows.append(self._data[start:start + 3*width])
+        return bytes(b"".join(rows))
+
+    def putRGB(self, data, x, y, width, height):
+        data = memoryview(data).cast("B")
+        for row in range(height):
+            start = 3*((y + row)*self._width + x)
+            self._data[start:start + 3*width] = data[3*row*width:3*(row+1)*width]
+            if self._shown is not None:
+                start = (y + row)*self._width + x
+                self._shown[start:start + width] = b"\x01" * width
+
+    def copy(self):
+        other = _RasterPhoto(self._data, self._width, self._height)
+        if self._shown is not None:
+            other._shown = bytearray(self._shown)
+        return other
+
+    def tkPhoto(self):
+        # Returns a tk.PhotoImage with the same pixels
+        width, height = self._width, self._height
+        if self._shown is None:
+            return tk.PhotoImage(master=_getRoot(), format="ppm",
+                                 data=_encodePNM(self._data, width, height, 3))
+        photo = tk.PhotoImage(master=_getRoot(), width=width, height=height)
+        for y in range(height):
+            for start, end in self.shownRuns(y):
+                _tkPhotoWrite(photo, self._data[3*(y*width + start):3*(y*width + end)],
+                              start, y, end - start, 1)
+        return photo
+
+
 class Image(GraphicsObject):
 
+    __slots__ = ("anchor", "imageId", "img")
+
     idCount = 0
     imageCache = {} # tk photoimages go here to avoid GC while drawn 
+    _pixelBounds = True
     
     def __init__(self, p, *pixmap):
+        # pixmap is a file name, a width and height for a blank image,
+        #   a NumPy array of pixels, or pixel bytes with width and height
         GraphicsObject.__init__(self, [])
         self.anchor = p.clone()
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
-        if len(pixmap) == 1: # file name provided
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
-        else: # width and height provided
+        # The pixels are kept in a _RasterPhoto, which the window an
+        #   image is drawn in converts if it needs to (see _photo)
+        if len(pixmap) == 1 and isinstance(pixmap[0], (str, os.PathLike)): # file name provided
+            self.img = _loadPhoto(os.fspath(pixmap[0]))
+        elif len(pixmap) == 2: # width and height provided
             width, height = pixmap
-            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.img = _RasterPhoto(bytearray(3*width*height), width, height, blank=True)
+        else: # pixel data provided
+            self.img = _RasterPhoto(*_pixelBuffer(*pixmap))
+
+    @classmethod
+    def fromArray(cls, p, pixels):
+        """Returns an Image anchored at p made from a NumPy uint8 array
+        of shape (height, width, 3), or (height, width) for gray levels"""
+        return cls(p, pixels)
+
+    @classmethod
+    def fromBytes(cls, p, data, width, height):
+        """Returns an Image anchored at p made from a bytes-like object
+        (bytes, bytearray, memoryview) of rgb or gray pixel rows"""
+        return cls(p, data, width, height)
 
     def __repr__(self):
         return "Image({}, {}, {})".format(self.anchor, self.getWidth(), self.getHeight())
@@ -892,8 +3750,16 @@ class Image(GraphicsObject):
     def _draw(self, canvas, options):
         p = self.anchor
         x,y = canvas.toScreen(p.x,p.y)
+        self.img = canvas._photo(self.img)
         self.imageCache[self.imageId] = self.img # save a reference  
-        return canvas.create_image(x,y,image=self.img)
+        return canvas.create_image(x,y,options,image=self.img)
+
+    def _coords(self, canvas):
+        p = self.anchor
+        return list(canvas.toScreen(p.x,p.y))
+
+    def _bounds(self, canvas):
+        return canvas._pixelBox(self.anchor, self.getWidth(), self.getHeight())
     
     def _move(self, dx, dy):
         self.anchor.move(dx,dy)
@@ -942,17 +3808,175 @@ class Image(GraphicsObject):
         
         """
         self.img.put("{" + color +"}", (x, y))
+
+    def _region(self, x, y, width, height):
+        # Fills in and checks a rectangle of the image
+        if width is None: width = self.getWidth() - x
+        if height is None: height = self.getHeight() - y
+        if (x < 0 or y < 0 or width < 0 or height < 0 or
+            x + width > self.getWidth() or y + height > self.getHeight()):
+            raise GraphicsError("Region outside of image")
+        return width, height
+
+    def _readRGB(self, x, y, width, height):
+        # Returns packed RGB bytes for a region
+        if not width or not height:
+            return b""
+        if isinstance(self.img, _RasterPhoto):
+            return self.img.getRGB(x, y, width, height)
+        return _tkPhotoRead(self.img, x, y, width, height)
+
+    def _writeRGB(self, data, x, y, width, height):
+        # Puts packed RGB bytes into a region
+        if not width or not height:
+            return
+        if isinstance(self.img, _RasterPhoto):
+            self.img.putRGB(data, x, y, width, height)
+        else:
+            _tkPhotoWrite(self.img, data, x, y, width, height)
+
+    def replace(self, pixels, width=None, height=None):
+        """Replaces the contents of the image with pixels, given as for
+        fromArray or fromBytes. A drawn image is updated in place; its
+        canvas item stays the same.
+
+        """
+        data, width, height, channels = _pixelBuffer(pixels, width, height)
+        if isinstance(self.img, _RasterPhoto):
+            self.img.load(data, width, height, channels)
+        else:
+            self.img.configure(width=width, height=height,
+                               data=_encodePNM(data, width, height, channels),
+                               format="ppm")
+        if self.canvas and not self.canvas.isClosed():
+            self.canvas._autoflush()
+
+    def getPixels(self, x=0, y=0, width=None, height=None):
+        """Returns the pixels of a rectangle of the image (the whole
+        image by default) as a NumPy uint8 array of shape
+        (height, width, 3). Without NumPy, returns bytes holding the
+        rows of r,g,b values.
+
+        """
+        width, height = self._region(x, y, width, height)
+        data = self._readRGB(x, y, width, height)
+        np = _numpy()
+        if np is None:
+            return data
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3).copy()
+
+    def setPixels(self, pixels, x=0, y=0, width=None):
+        """Sets a rectangle of the image with upper-left corner (x,y)
+        from pixels, either a NumPy array of shape (height, width, 3)
+        (or (height, width) for gray levels) or a bytes-like object of
+        r,g,b rows that are width pixels wide (the rest of the image
+        width by default).
+
+        """
+        if _isArray(pixels):
+            np = _np
+            if pixels.ndim == 2:
+                pixels = np.repeat(pixels[:,:,np.newaxis], 3, axis=2)
+            if pixels.ndim != 3 or pixels.shape[2] != 3:
+                raise GraphicsError(BAD_OPTION)
+            height, width = pixels.shape[:2]
+            data = np.ascontiguousarray(pixels, dtype=np.uint8).tobytes()
+        else:
+            data = memoryview(pixels).cast("B")
+            if width is None: width = self.getWidth() - x
+            if width <= 0 or len(data) % (3*width):
+                raise GraphicsError(BAD_OPTION)
+            height = len(data) // (3*width)
+        self._region(x, y, width, height)
+        self._writeRGB(data, x, y, width, height)
         
 
     def save(self, filename):
         """Saves the pixmap image to filename.
         The format for the save image is determined from the filname extension.
+        ppm, pgm and png files are encoded directly from the pixel data.
 
         """
         
+        filename = os.fspath(filename)
         path, name = os.path.split(filename)
         ext = name.split(".")[-1]
-        self.img.write( filename, format=ext)
+        if ext.lower() in _ENCODERS:
+            width, height = self.getWidth(), self.getHeight()
+            savePixels(filename, self._readRGB(0, 0, width, height), width, height)
+        elif isinstance(self.img, _RasterPhoto):
+            # Other formats are written by Tk
+            try:
+                photo = self.img.tkPhoto()
+            except tk.TclError:
+                raise GraphicsError("Unsupported image format: " + ext)
+            photo.write(filename, format=ext)
+        else:
+            self.img.write( filename, format=ext)
+
+
+class FrameRecorder:
+
+    """Saves a numbered sequence of frames from a background thread.
+
+    pattern is a file name with a %-format for the frame number, e.g.
+    "frames/anim%05d.png". Frames added with add() are copied on the
+    calling thread and encoded and written by a worker thread; at most
+    maxPending frames are held in memory, after which add() waits."""
+
+    def __init__(self, pattern, start=0, maxPending=16):
+        self.pattern = pattern
+        self.count = start
+        self._queue = queue.Queue(maxPending)
+        self._error = None
+        self._worker = threading.Thread(target=self._run)
+        self._worker.daemon = True
+        self._worker.start()
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            filename, data, width, height = frame
+            if self._error is None:
+                try:
+                    savePixels(filename, data, width, height)
+                except Exception as e:
+                    self._error = e
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise GraphicsError("Frame could not be saved: {}".format(error))
+
+    def add(self, frame, width=None, height=None):
+        """Queues frame, an Image or pixel data as for savePixels, to be
+        saved as the next file in the sequence. Returns the file name."""
+        self._check()
+        if isinstance(frame, Image):
+            width, height = frame.getWidth(), frame.getHeight()
+            data = frame._readRGB(0, 0, width, height)
+        else:
+            data, width, height, channels = _pixelBuffer(frame, width, height)
+            data = bytes(data)  # the caller may reuse its buffer
+        filename = self.pattern % self.count
+        self.count = self.count + 1
+        self._queue.put((filename, data, width, height))
+        return filename
+
+    def close(self):
+        """Waits until all queued frames are written"""
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
         
 def color_rgb(r,g,b):
@@ -1007,8 +4031,5 @@ def test():
 #MacOS fix 2
 #tk.Toplevel(_root).destroy()
 
-# MacOS fix 1
-update()
-
 
 #test()
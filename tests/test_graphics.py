@@ -0,0 +1,159 @@
+"""Tests for graphics.py
+
+Run with python -m unittest discover tests. The Tk tests need a
+display, and are skipped without one.
+"""
+
+import os, sys, threading, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import graphics
+
+def tkWindow(*args, **kw):
+    """Returns a Tk GraphWin, skipping the test if there is no display"""
+    try:
+        return graphics.GraphWin(*args, backend="tk", **kw)
+    except graphics.tk.TclError as error:
+        raise unittest.SkipTest("no display: {}".format(error))
+
+class TestBatchCreates(unittest.TestCase):
+
+    def setUp(self):
+        self.win = tkWindow("Test", 200, 200, autoflush=False)
+        self.addCleanup(self.win.close)
+
+    def spyScript(self):
+        # Records the results of the window's Tcl scripts
+        results = []
+        runScript = self.win._runScript
+        def spy(script):
+            results.append(runScript(script))
+            return results[-1]
+        self.win._runScript = spy
+        return results
+
+    def testScriptReturnsIds(self):
+        results = self.spyScript()
+        shapes = [graphics.Circle(graphics.Point(20*i, 20), 5) for i in range(5)]
+        shapes.append(graphics.Text(graphics.Point(50, 50), 'a "quoted" {word} $x [y]'))
+        with self.win.batch():
+            for shape in shapes:
+                shape.draw(self.win)
+        self.assertEqual(len(results), 1)
+        ids = [self.win.tk.getint(id) for id in self.win.tk.splitlist(results[0])]
+        self.assertEqual(ids, [shape.id for shape in shapes])
+        self.assertEqual(self.win.itemcget(shapes[-1].id, "text"), 'a "quoted" {word} $x [y]')
+
+    def testOptionErrorRaisedForObject(self):
+        shapes = [graphics.Circle(graphics.Point(20*i, 20), 5) for i in range(3)]
+        shapes[1].setFill("no such color")
+        with self.assertRaises(graphics.tk.TclError):
+            with self.win.batch():
+                for shape in shapes:
+                    shape.draw(self.win)
+        self.assertIsNotNone(shapes[0].id)
+        self.assertFalse(self.win.tk.getboolean(
+            self.win.tk.call("info", "exists", "_graphicsIds")))
+
+class TestSubmit(unittest.TestCase):
+
+    def setUp(self):
+        self.win = tkWindow("Test", 200, 200, autoflush=False)
+        self.addCleanup(self.win.close)
+
+    def testNoTimerWhileIdle(self):
+        self.win.update()
+        self.assertIsNone(self.win._commandAfter)
+
+    def testWorkerCommandsAppliedWhileWaiting(self):
+        circle = graphics.Circle(graphics.Point(50, 50), 5)
+        # Submitted once the window is waiting in getMouse
+        worker = threading.Timer(0.1, self.win.submit, (circle, "draw"))
+        worker.start()
+        self.win.getMouse(timeout=0.5)
+        worker.join()
+        self.assertIs(circle.canvas, self.win)
+
+class TestRasterImage(unittest.TestCase):
+
+    def setUp(self):
+        self.win = graphics.GraphWin("Test", 40, 40, backend="raster")
+        self.win.setBackground("white")
+
+    def pixel(self, x, y):
+        data = bytes(self.win.getPixels()[y, x]) if graphics._numpy() else \
+            self.win.getPixels()[3*(y*40 + x):3*(y*40 + x) + 3]
+        return tuple(data)
+
+    def testBlankImageIsTransparent(self):
+        image = graphics.Image(graphics.Point(10, 10), 6, 6)
+        image.setPixel(0, 0, "red")
+        image.draw(self.win)
+        self.assertEqual(self.pixel(7, 7), (255, 0, 0))
+        self.assertEqual(self.pixel(8, 8), (255, 255, 255))
+
+    def testPathFileName(self):
+        import pathlib, tempfile
+        image = graphics.Image(graphics.Point(0, 0), bytes([1, 2, 3])*6, 3, 2)
+        with tempfile.TemporaryDirectory() as folder:
+            path = pathlib.Path(folder, "image.ppm")
+            image.save(path)
+            loaded = graphics.Image(graphics.Point(0, 0), path)
+        self.assertEqual((loaded.getWidth(), loaded.getHeight()), (3, 2))
+        self.assertEqual(loaded.getPixel(2, 1), [1, 2, 3])
+
+    def testPixelImage(self):
+        image = graphics.Image(graphics.Point(20, 20), bytes([0, 255, 0])*4, 2, 2)
+        image.draw(self.win)
+        self.assertEqual(self.pixel(19, 19), (0, 255, 0))
+        self.assertEqual(image.getPixel(1, 1), [0, 255, 0])
+
+class TestRasterColors(unittest.TestCase):
+
+    def testTkColorNames(self):
+        self.assertEqual(graphics._rgb("dark orange"), (255, 140, 0))
+        self.assertEqual(graphics._rgb("ForestGreen"), (34, 139, 34))
+        self.assertEqual(graphics._rgb("green"), (0, 128, 0))
+        self.assertEqual(graphics._rgb("gray50"), (127, 127, 127))
+
+    def testUnknownColorRaisedWhenSet(self):
+        win = graphics.GraphWin("Test", 40, 40, backend="raster")
+        circle = graphics.Circle(graphics.Point(20, 20), 5)
+        circle.draw(win)
+        with self.assertRaises(graphics.GraphicsError):
+            circle.setFill("no such color")
+
+class TestInstrumentation(unittest.TestCase):
+
+    def testOperationsCountedByClass(self):
+        win = graphics.GraphWin("Test", 100, 100, autoflush=False, backend="raster")
+        win.setInstrumentation(True)
+        image = graphics.Image(graphics.Point(30, 30), 4, 4).draw(win)
+        circle = graphics.Circle(graphics.Point(50, 50), 5).draw(win)
+        circle.setFill("red")
+        win.update()
+        # The first coordinate is the image's item id, not the item drawn
+        win.plot(image.id, 3)
+        operations = win.getStats()["operations"]
+        self.assertEqual(set(operations["create_image"]["classes"]), {"Image"})
+        self.assertEqual(set(operations["create_oval"]["classes"]), {"Circle"})
+        self.assertEqual(set(operations["itemconfig"]["classes"]), {"Circle"})
+        self.assertEqual(set(operations["create_line"]["classes"]), {"GraphWin"})
+
+class TestIsArray(unittest.TestCase):
+
+    def testOtherClassNamedNdarray(self):
+        class ndarray:
+            pass
+        self.assertFalse(graphics._isArray(ndarray()))
+
+    def testArraySubclass(self):
+        try:
+            import numpy
+        except ImportError:
+            raise unittest.SkipTest("NumPy is not installed")
+        self.assertTrue(graphics._isArray(numpy.zeros((2, 2)).view(numpy.matrix)))
+
+if __name__ == "__main__":
+    unittest.main()